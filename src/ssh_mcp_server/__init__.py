@@ -2,7 +2,6 @@
 
 __version__ = "1.0.0"
 
-from .server import main
 from .config import ConfigManager
 from .state import StateManager
 from .ssh_session import SSHSessionManager
@@ -17,5 +16,9 @@ __all__ = [
 ]
 
 
-
-
+def __getattr__(name):
+    # Import the MCP server lazily so library users don't pay for mcp
+    if name == "main":
+        from .server import main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,6 @@
+"""PyYAML loader selection, probed once for the whole package."""
+
+import yaml
+
+# Prefer the libyaml-backed loader when PyYAML was built with it
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
@@ -1,8 +1,11 @@
 import os
+import shlex
 import yaml
 from typing import Dict, Optional
 from pathlib import Path
 
+from ._yaml_compat import Loader as SafeLoader
+
 # Import resolve_info_file_path lazily to avoid circular import
 # It's used in ConnectionConfig.__init__ but imported there to avoid issues
 
@@ -12,10 +15,86 @@ class ConfigError(Exception):
     pass
 
 
+_YAML_NULL_TAG = 'tag:yaml.org,2002:null'
+
+# Implicit scalar types a config can use; floats and timestamps stay strings
+_CONFIG_RESOLVER_TAGS = frozenset({
+    'tag:yaml.org,2002:bool',
+    'tag:yaml.org,2002:int',
+    'tag:yaml.org,2002:merge',
+    _YAML_NULL_TAG,
+})
+
+
+class _ConfigLoader(SafeLoader):
+    """SafeLoader that skips implicit resolvers the config format never needs."""
+
+
+_ConfigLoader.yaml_implicit_resolvers = {}
+for _first_char, _resolvers in SafeLoader.yaml_implicit_resolvers.items():
+    _kept = [(tag, regexp) for tag, regexp in _resolvers if tag in _CONFIG_RESOLVER_TAGS]
+    if _kept:
+        _ConfigLoader.yaml_implicit_resolvers[_first_char] = _kept
+del _first_char, _resolvers, _kept
+
+
+def _load_connections_section(stream):
+    """Parse a config document and construct only its 'connections' value.
+    
+    The document is composed into a node graph and only the 'connections'
+    subtree is turned into Python objects; other top-level sections (such
+    as anchors kept for reuse) are never constructed.
+    """
+    loader = _ConfigLoader(stream)
+    try:
+        root = loader.get_single_node()
+        if root is None or root.tag == _YAML_NULL_TAG or \
+                (isinstance(root, yaml.MappingNode) and not root.value):
+            raise ConfigError("Configuration file is empty")
+        
+        connections_node = None
+        if isinstance(root, yaml.MappingNode):
+            loader.flatten_mapping(root)  # Resolve top-level merge keys
+            for key_node, value_node in root.value:
+                if isinstance(key_node, yaml.ScalarNode) and key_node.value == 'connections':
+                    connections_node = value_node
+        
+        if connections_node is None:
+            raise ConfigError("Configuration must contain 'connections' section")
+        
+        return loader.construct_object(connections_node, deep=True)
+    finally:
+        loader.dispose()
+
+
+def _scan_key_files(connections_data: dict) -> set:
+    """Return configured key paths known to exist, listing each key directory once."""
+    key_dirs: Dict[str, set] = {}
+    for conn_config in connections_data.values():
+        key_path = conn_config.get('key_path') if isinstance(conn_config, dict) else None
+        if key_path:
+            key_path = os.path.expanduser(key_path)
+            key_dirs.setdefault(os.path.dirname(key_path), set()).add(key_path)
+    
+    found = set()
+    for key_dir, key_paths in key_dirs.items():
+        try:
+            with os.scandir(key_dir or '.') as entries:
+                names = {entry.name for entry in entries if entry.is_file()}
+        except OSError:
+            continue  # ConnectionConfig falls back to a direct check
+        found.update(path for path in key_paths if os.path.basename(path) in names)
+    return found
+
+
 class ConnectionConfig:
     """Represents a single SSH connection configuration."""
     
-    def __init__(self, name: str, config_dict: dict):
+    __slots__ = ('name', 'host', 'user', 'key_path', 'port', 'password',
+                 'description', 'info_file', '_cached_dict', '_ssh_command')
+    
+    def __init__(self, name: str, config_dict: dict,
+                 known_key_files: Optional[set] = None):
         self.name = name
         self.host = config_dict.get('host')
         self.user = config_dict.get('user')
@@ -38,8 +117,9 @@ class ConnectionConfig:
         if self.key_path:
             self.key_path = os.path.expanduser(self.key_path)
             
-            # Verify key file exists
-            if not os.path.exists(self.key_path):
+            # Verify key file exists (known_key_files is a pre-scanned positive cache)
+            if (not known_key_files or self.key_path not in known_key_files) \
+                    and not os.path.exists(self.key_path):
                 raise ConfigError(f"Connection '{name}': Key file not found: {self.key_path}")
         
         # Handle info_file path resolution
@@ -50,16 +130,42 @@ class ConnectionConfig:
             self.info_file = resolve_info_file_path(info_file)
         else:
             self.info_file = None
+        
+        self._cached_dict = None
+        self._ssh_command = None
+    
+    @property
+    def ssh_command(self) -> str:
+        """Shell-quoted SSH command for this connection (built once)."""
+        if self._ssh_command is None:
+            # Use -tt for pseudo-terminal (interactive behavior)
+            cmd_parts = ['ssh', '-tt']
+            
+            # Add key path if provided (recommended for security)
+            if self.key_path:
+                cmd_parts.extend(['-i', self.key_path])
+            
+            if self.port != 22:
+                cmd_parts.extend(['-p', str(self.port)])
+            
+            cmd_parts.append(f'{self.user}@{self.host}')
+            self._ssh_command = shlex.join(cmd_parts)
+        return self._ssh_command
     
     def to_dict(self) -> dict:
-        """Convert to dictionary (for API responses, without sensitive data)."""
-        return {
-            'name': self.name,
-            'host': self.host,
-            'user': self.user,
-            'port': self.port,
-            'description': self.description
-        }
+        """Convert to dictionary (for API responses, without sensitive data).
+        
+        The dict is built once and shared; callers must not modify it.
+        """
+        if self._cached_dict is None:
+            self._cached_dict = {
+                'name': self.name,
+                'host': self.host,
+                'user': self.user,
+                'port': self.port,
+                'description': self.description
+            }
+        return self._cached_dict
 
 
 class ConfigManager:
@@ -71,6 +177,7 @@ class ConfigManager:
     def __init__(self, config_path: Optional[str] = None):
         self.config_path = config_path or self.CONFIG_PATH
         self.connections: Dict[str, ConnectionConfig] = {}
+        self._connection_list: list = []
         self._ensure_base_directory()
         self._load_config()
     
@@ -86,36 +193,35 @@ class ConfigManager:
         
         try:
             with open(self.config_path, 'r') as f:
-                config_data = yaml.safe_load(f)
+                connections_data = _load_connections_section(f)
+        except ConfigError:
+            raise
         except yaml.YAMLError as e:
             raise ConfigError(f"Failed to parse YAML: {e}")
         except Exception as e:
             raise ConfigError(f"Failed to read config file: {e}")
         
-        if not config_data:
-            raise ConfigError("Configuration file is empty")
-        
-        if 'connections' not in config_data:
-            raise ConfigError("Configuration must contain 'connections' section")
-        
-        connections_data = config_data['connections']
         if not isinstance(connections_data, dict):
             raise ConfigError("'connections' must be a dictionary")
         
         # Parse each connection
+        known_key_files = _scan_key_files(connections_data)
         for name, conn_config in connections_data.items():
             try:
-                self.connections[name] = ConnectionConfig(name, conn_config)
+                self.connections[name] = ConnectionConfig(name, conn_config, known_key_files)
             except ConfigError as e:
                 raise ConfigError(f"Invalid connection config '{name}': {e}")
+        
+        # Configs are immutable once loaded; rebuild this if reloading is added
+        self._connection_list = [conn.to_dict() for conn in self.connections.values()]
     
     def get_connection(self, name: str) -> Optional[ConnectionConfig]:
         """Get connection configuration by name."""
         return self.connections.get(name)
     
     def list_connections(self) -> list:
-        """Get list of all connection configurations."""
-        return [conn.to_dict() for conn in self.connections.values()]
+        """Get list of all connection configurations (shared; do not modify)."""
+        return self._connection_list
     
     def connection_exists(self, name: str) -> bool:
         """Check if connection configuration exists."""
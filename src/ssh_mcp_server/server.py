@@ -2,11 +2,11 @@
 """SSH MCP Server - Main entry point."""
 
 import sys
+import json
 import asyncio
 import logging
 from typing import Any
 
-from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions, Server
 from mcp import types
 
@@ -29,6 +29,7 @@ from .tools.terminal import (
     interrupt_command_tool
 )
 from .tools.server_info import get_server_info_tool
+from .tools import submit_tool
 
 # Set up logging
 logging.basicConfig(
@@ -47,127 +48,149 @@ session_manager: SSHSessionManager = None
 # Create MCP server
 server = Server("mcp-ssh-interactive")
 
+# Tool name -> (handler, global manager passed first, ((argument, default), ...))
+TOOL_DISPATCH = {
+    "list_available_configs": (list_available_configs, "config_manager", ()),
+    "open_connection": (open_connection_tool, "session_manager",
+                        (("connection_config_name", None), ("session_name", None))),
+    "list_connections": (list_connections_tool, "session_manager", ()),
+    "close_connection": (close_connection_tool, "session_manager",
+                         (("session_name", None),)),
+    "execute_command": (execute_command_tool, "session_manager",
+                        (("session_name", None), ("command", None))),
+    "get_terminal_output": (get_terminal_output_tool, "session_manager",
+                            (("session_name", None), ("num_lines", 200))),
+    "interrupt_command": (interrupt_command_tool, "session_manager",
+                          (("session_name", None),)),
+    "get_server_info": (get_server_info_tool, "config_manager",
+                        (("connection_config_name", None),)),
+}
 
-@server.list_tools()
-async def handle_list_tools() -> list[types.Tool]:
-    """List all available MCP tools."""
-    return [
-        types.Tool(
-            name="list_available_configs",
-            description="Lists all available SSH server configurations that you can connect to. Use this to discover what remote servers are available before opening a connection. Returns connection names, hosts, and descriptions for each configured server.",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        ),
-        types.Tool(
-            name="open_connection",
-            description="Opens a new SSH connection to a remote server and creates a persistent tmux session for it. You must provide a connection_config_name (from list_available_configs) and a unique session_name. The session will remain active until you explicitly close it. Use the session_name to execute commands and manage this connection. After successfully opening a connection, check if the server has additional information by calling get_server_info with the connection_config_name.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "connection_config_name": {
-                        "type": "string",
-                        "description": "Name of the connection configuration (from list_available_configs)"
-                    },
-                    "session_name": {
-                        "type": "string",
-                        "description": "Unique name for this session (alphanumeric, underscores, hyphens only)"
-                    }
-                },
-                "required": ["connection_config_name", "session_name"]
-            }
-        ),
-        types.Tool(
-            name="list_connections",
-            description="Lists all currently active SSH sessions. Shows session names, connection details, and status for each session. Use this to see what connections you have open and their current state.",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        ),
-        types.Tool(
-            name="execute_command",
-            description="Executes a command on a remote server via SSH. The command is sent to the terminal immediately and this function returns right away. To see the command output and check if it has completed, use get_terminal_output after a reasonable wait time. Look for the command prompt (e.g., '$', '#', or your custom prompt) to return in the output, which indicates the command has finished - just like a human would do when working in a terminal.\n\n**IMPORTANT INSTRUCTION FOR AI AGENTS:** Before executing any command that might modify the filesystem, change system configuration, install/remove software, restart services, or perform any other state-changing operation, you MUST ask the user for explicit confirmation. Only proceed after receiving clear user approval. Read-only operations can be executed without confirmation. When in doubt about whether a command is safe, ask for confirmation first.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "session_name": {
-                        "type": "string",
-                        "description": "Name of the session to execute command in"
-                    },
-                    "command": {
-                        "type": "string",
-                        "description": "Command to execute on the remote server"
-                    }
-                },
-                "required": ["session_name", "command"]
-            }
-        ),
-        types.Tool(
-            name="get_terminal_output",
-            description="Captures the current visible terminal output (like taking a screenshot of the terminal). Use this after executing a command to see the output and check if the command has completed. Look for the command prompt returning (e.g., '$', '#') to confirm the command finished. This is the primary way to retrieve command results and monitor command execution.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "session_name": {
-                        "type": "string",
-                        "description": "Name of the session"
-                    },
-                    "num_lines": {
-                        "type": "integer",
-                        "description": "Number of lines to retrieve (default: 200)",
-                        "default": 200
-                    }
-                },
-                "required": ["session_name"]
-            }
-        ),
-        types.Tool(
-            name="interrupt_command",
-            description="Sends Ctrl+C signal to the remote terminal to interrupt a running command. Use this when a command is taking too long or appears stuck. The function returns immediately after sending the signal - wait a moment (1-2 seconds) then check get_terminal_output to verify the command was interrupted.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "session_name": {
-                        "type": "string",
-                        "description": "Name of the session"
-                    }
+
+# Tool definitions are static, so build them once at import
+TOOL_DEFINITIONS: list[types.Tool] = [
+    types.Tool(
+        name="list_available_configs",
+        description="Lists all available SSH server configurations that you can connect to. Use this to discover what remote servers are available before opening a connection. Returns connection names, hosts, and descriptions for each configured server.",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    ),
+    types.Tool(
+        name="open_connection",
+        description="Opens a new SSH connection to a remote server and creates a persistent tmux session for it. You must provide a connection_config_name (from list_available_configs) and a unique session_name. The session will remain active until you explicitly close it. Use the session_name to execute commands and manage this connection. After successfully opening a connection, check if the server has additional information by calling get_server_info with the connection_config_name.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "connection_config_name": {
+                    "type": "string",
+                    "description": "Name of the connection configuration (from list_available_configs)"
                 },
-                "required": ["session_name"]
-            }
-        ),
-        types.Tool(
-            name="close_connection",
-            description="Closes an SSH connection and terminates the tmux session. Call this when you're done working with a remote server to clean up resources. The log file is preserved for later review if needed. Any running commands in this session will be terminated.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "session_name": {
-                        "type": "string",
-                        "description": "Name of the session to close"
-                    }
+                "session_name": {
+                    "type": "string",
+                    "description": "Unique name for this session (alphanumeric, underscores, hyphens only)"
+                }
+            },
+            "required": ["connection_config_name", "session_name"]
+        }
+    ),
+    types.Tool(
+        name="list_connections",
+        description="Lists all currently active SSH sessions. Shows session names, connection details, and status for each session. Use this to see what connections you have open and their current state.",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    ),
+    types.Tool(
+        name="execute_command",
+        description="Executes a command on a remote server via SSH. The command is sent to the terminal immediately and this function returns right away. To see the command output and check if it has completed, use get_terminal_output after a reasonable wait time. Look for the command prompt (e.g., '$', '#', or your custom prompt) to return in the output, which indicates the command has finished - just like a human would do when working in a terminal.\n\n**IMPORTANT INSTRUCTION FOR AI AGENTS:** Before executing any command that might modify the filesystem, change system configuration, install/remove software, restart services, or perform any other state-changing operation, you MUST ask the user for explicit confirmation. Only proceed after receiving clear user approval. Read-only operations can be executed without confirmation. When in doubt about whether a command is safe, ask for confirmation first.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "session_name": {
+                    "type": "string",
+                    "description": "Name of the session to execute command in"
                 },
-                "required": ["session_name"]
-            }
-        ),
-        types.Tool(
-            name="get_server_info",
-            description="Retrieves server-specific information and instructions for a connection configuration. Use this after opening a connection to learn about server-specific procedures, commands, and important information. The information applies to all sessions for this server configuration, so you only need to call it once per server configuration.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "connection_config_name": {
-                        "type": "string",
-                        "description": "Name of the connection configuration (from list_available_configs)"
-                    }
+                "command": {
+                    "type": "string",
+                    "description": "Command to execute on the remote server"
+                }
+            },
+            "required": ["session_name", "command"]
+        }
+    ),
+    types.Tool(
+        name="get_terminal_output",
+        description="Captures the current visible terminal output (like taking a screenshot of the terminal). Use this after executing a command to see the output and check if the command has completed. Look for the command prompt returning (e.g., '$', '#') to confirm the command finished. This is the primary way to retrieve command results and monitor command execution.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "session_name": {
+                    "type": "string",
+                    "description": "Name of the session"
                 },
-                "required": ["connection_config_name"]
-            }
-        )
-    ]
+                "num_lines": {
+                    "type": "integer",
+                    "description": "Number of lines to retrieve (default: 200)",
+                    "default": 200
+                }
+            },
+            "required": ["session_name"]
+        }
+    ),
+    types.Tool(
+        name="interrupt_command",
+        description="Sends Ctrl+C signal to the remote terminal to interrupt a running command. Use this when a command is taking too long or appears stuck. The function returns immediately after sending the signal - wait a moment (1-2 seconds) then check get_terminal_output to verify the command was interrupted.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "session_name": {
+                    "type": "string",
+                    "description": "Name of the session"
+                }
+            },
+            "required": ["session_name"]
+        }
+    ),
+    types.Tool(
+        name="close_connection",
+        description="Closes an SSH connection and terminates the tmux session. Call this when you're done working with a remote server to clean up resources. The log file is preserved for later review if needed. Any running commands in this session will be terminated.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "session_name": {
+                    "type": "string",
+                    "description": "Name of the session to close"
+                }
+            },
+            "required": ["session_name"]
+        }
+    ),
+    types.Tool(
+        name="get_server_info",
+        description="Retrieves server-specific information and instructions for a connection configuration. Use this after opening a connection to learn about server-specific procedures, commands, and important information. The information applies to all sessions for this server configuration, so you only need to call it once per server configuration.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "connection_config_name": {
+                    "type": "string",
+                    "description": "Name of the connection configuration (from list_available_configs)"
+                }
+            },
+            "required": ["connection_config_name"]
+        }
+    )
+]
+
+
+@server.list_tools()
+async def handle_list_tools() -> list[types.Tool]:
+    """List all available MCP tools."""
+    return list(TOOL_DEFINITIONS)
 
 
 @server.call_tool()
@@ -181,56 +204,20 @@ async def handle_call_tool(
     
     try:
         # Route to appropriate tool handler
-        if name == "list_available_configs":
-            result = list_available_configs(config_manager)
-        
-        elif name == "open_connection":
-            result = open_connection_tool(
-                session_manager,
-                arguments.get("connection_config_name"),
-                arguments.get("session_name")
-            )
-        
-        elif name == "list_connections":
-            result = list_connections_tool(session_manager)
-        
-        elif name == "close_connection":
-            result = close_connection_tool(
-                session_manager,
-                arguments.get("session_name")
-            )
-        
-        elif name == "execute_command":
-            result = execute_command_tool(
-                session_manager,
-                arguments.get("session_name"),
-                arguments.get("command")
-            )
-        
-        elif name == "get_terminal_output":
-            result = get_terminal_output_tool(
-                session_manager,
-                arguments.get("session_name"),
-                arguments.get("num_lines", 200)
-            )
-        
-        elif name == "interrupt_command":
-            result = interrupt_command_tool(
-                session_manager,
-                arguments.get("session_name")
-            )
-        
-        elif name == "get_server_info":
-            result = get_server_info_tool(
-                config_manager,
-                arguments.get("connection_config_name")
-            )
-        
-        else:
+        entry = TOOL_DISPATCH.get(name)
+        if entry is None:
             result = {"error": f"Unknown tool: {name}"}
+        else:
+            handler, manager_name, params = entry
+            # Tools block on tmux and SSH polling; run them off the event
+            # loop so concurrent calls overlap instead of queueing
+            result = await asyncio.wrap_future(submit_tool(
+                handler,
+                globals()[manager_name],
+                *(arguments.get(param, default) for param, default in params)
+            ))
         
         # Convert result to JSON string
-        import json
         result_text = json.dumps(result, indent=2)
         
         return [types.TextContent(type="text", text=result_text)]
@@ -238,7 +225,6 @@ async def handle_call_tool(
     except Exception as e:
         logger.error(f"Error executing tool {name}: {e}", exc_info=True)
         error_result = {"error": f"Tool execution failed: {str(e)}"}
-        import json
         return [types.TextContent(type="text", text=json.dumps(error_result, indent=2))]
 
 
@@ -279,21 +265,26 @@ async def main():
     
     # Run the server
     logger.info("Starting MCP SSH Interactive Server...")
+    from mcp.server.models import InitializationOptions
     from mcp.server.stdio import stdio_server
     
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="mcp-ssh-interactive",
-                server_version="1.0.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="mcp-ssh-interactive",
+                    server_version="1.0.0",
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={},
+                    )
                 )
             )
-        )
+    finally:
+        # Persist any deferred state writes before exiting
+        state_manager.flush()
 
 
 def run():
@@ -1,3 +1,4 @@
+import re
 import time
 import os
 from typing import Optional
@@ -6,6 +7,39 @@ from .config import ConfigManager, ConnectionConfig
 from .state import StateManager, ensure_log_directory, get_log_file_path
 
 
+SESSION_NAME_RE = re.compile(r'[a-zA-Z0-9_-]+')
+
+# Substrings (lowercase) in pane output that indicate a failed SSH connection
+SSH_ERROR_PATTERNS = (
+    'connection refused',
+    'permission denied',
+    'host key verification failed',
+    'no route to host',
+    'network is unreachable',
+)
+
+
+# Backoff schedule (seconds) while waiting for SSH to settle; sums to 3s
+CONNECT_POLL_DELAYS = (0.05, 0.1, 0.2, 0.4, 0.8, 1.45)
+
+# Line endings that mean SSH is done connecting: a shell prompt, a password
+# prompt, or a host key confirmation question
+_READY_RE = re.compile(r'(?:[$#>%]|password:|\(yes/no[^)]*\)\?)\s*$', re.IGNORECASE)
+
+
+def find_ssh_error(output: str) -> Optional[str]:
+    """Return the first SSH error pattern found in pane output, if any."""
+    # str.__contains__ is a C-level fast search (with its own bloom-mask
+    # skip), so it needs no prefilter and beats a compiled alternation
+    # regex over the same buffer. Lowering once is far cheaper than
+    # re.IGNORECASE, which disables sre's literal search.
+    output_lower = output.lower()
+    for pattern in SSH_ERROR_PATTERNS:
+        if pattern in output_lower:
+            return pattern
+    return None
+
+
 class SSHSessionError(Exception):
     """Raised when SSH session operations fail."""
     pass
@@ -36,8 +70,7 @@ class SSHSessionManager:
             )
         
         # 2. Validate session name format
-        import re
-        if not re.match(r'^[a-zA-Z0-9_-]+$', session_name):
+        if not SESSION_NAME_RE.fullmatch(session_name):
             raise SSHSessionError(
                 f"Invalid session name '{session_name}'. "
                 "Must contain only alphanumeric characters, underscores, and hyphens."
@@ -51,55 +84,26 @@ class SSHSessionManager:
         ensure_log_directory()
         log_file = get_log_file_path(session_name)
         
-        # 5. Create tmux session
-        try:
-            self.tmux.create_session(session_name)
-        except TmuxError as e:
-            raise SSHSessionError(f"Failed to create tmux session: {e}")
-        
-        # 6. Set history limit
-        try:
-            self.tmux.set_history_limit(session_name, 200000)
-        except TmuxError as e:
-            self.tmux.kill_session(session_name)
-            raise SSHSessionError(f"Failed to set history limit: {e}")
-        
-        # 7. Start SSH connection
+        # 5-8. Create tmux session, set history limit, start logging and
+        # start SSH, all in one tmux invocation
         ssh_command = self._build_ssh_command(conn_config)
         try:
-            self.tmux.send_command(session_name, ssh_command)
-        except TmuxError as e:
-            self.tmux.kill_session(session_name)
-            raise SSHSessionError(f"Failed to start SSH: {e}")
-        
-        # 8. Start logging
-        try:
-            self.tmux.start_logging(session_name, log_file)
+            self.tmux.create_session_configured(
+                session_name, 200000, log_file, command=ssh_command
+            )
         except TmuxError as e:
-            self.tmux.kill_session(session_name)
-            raise SSHSessionError(f"Failed to start logging: {e}")
-        
-        # 9. Wait for connection to establish
-        time.sleep(3)
+            # Never kill a pre-existing tmux session we failed to create
+            if 'duplicate session' not in str(e):
+                self.tmux.kill_session(session_name)
+            raise SSHSessionError(f"Failed to set up tmux session: {e}")
         
-        # 10. Check connection success
+        # 9-10. Wait for connection to settle, then check connection success
         try:
-            output = self.tmux.capture_pane(session_name, num_lines=50)
-            
             # Look for connection errors
-            error_patterns = [
-                'connection refused',
-                'permission denied',
-                'host key verification failed',
-                'no route to host',
-                'network is unreachable'
-            ]
-            
-            output_lower = output.lower()
-            for pattern in error_patterns:
-                if pattern in output_lower:
-                    self.tmux.kill_session(session_name)
-                    raise SSHSessionError(f"SSH connection failed: {pattern}")
+            error = self._wait_for_connection(session_name, ssh_command)
+            if error:
+                self.tmux.kill_session(session_name)
+                raise SSHSessionError(f"SSH connection failed: {error}")
             
         except TmuxError as e:
             self.tmux.kill_session(session_name)
@@ -142,6 +146,29 @@ class SSHSessionManager:
         
         return result
     
+    def _wait_for_connection(self, session_name: str, ssh_command: str) -> Optional[str]:
+        """Poll the pane until SSH shows an error or a prompt.
+        
+        Returns the SSH error pattern found in the last capture, or None.
+        """
+        error = None
+        for delay in CONNECT_POLL_DELAYS:
+            time.sleep(delay)
+            output = self.tmux.capture_pane(session_name, num_lines=50)
+            
+            # Each capture is scanned exactly once
+            error = find_ssh_error(output)
+            if error:
+                break
+            
+            # The local prompt line still holds the typed ssh command
+            lines = output.rstrip().splitlines()
+            last_line = lines[-1] if lines else ''
+            if ssh_command not in last_line and _READY_RE.search(last_line):
+                break
+        
+        return error
+    
     def close_connection(self, session_name: str) -> dict:
         """Close an SSH connection."""
         # 1. Validate session exists
@@ -170,12 +197,17 @@ class SSHSessionManager:
         """List all active connections."""
         sessions = []
         
-        for session_state in self.state.list_sessions():
+        session_states = self.state.list_sessions()
+        
+        # One tmux invocation for all liveness checks
+        alive = self.tmux.batch_session_exists([s.session_name for s in session_states])
+        
+        for session_state in session_states:
             # Get connection config info
             conn_config = self.config.get_connection(session_state.connection_config)
             
             # Check if tmux session is alive
-            status = 'active' if self.tmux.session_exists(session_state.session_name) else 'disconnected'
+            status = 'active' if alive[session_state.session_name] else 'disconnected'
             
             session_info = {
                 'session_name': session_state.session_name,
@@ -196,22 +228,7 @@ class SSHSessionManager:
     
     def _build_ssh_command(self, conn_config: ConnectionConfig) -> str:
         """Build SSH command string."""
-        # Use -tt for pseudo-terminal (interactive behavior)
-        cmd_parts = [
-            'ssh',
-            '-tt',
-        ]
-        
-        # Add key path if provided (recommended for security)
-        if conn_config.key_path:
-            cmd_parts.extend(['-i', conn_config.key_path])
-        
-        if conn_config.port != 22:
-            cmd_parts.extend(['-p', str(conn_config.port)])
-        
-        cmd_parts.append(f'{conn_config.user}@{conn_config.host}')
-        
-        return ' '.join(cmd_parts)
+        return conn_config.ssh_command
     
     def get_session_status(self, session_name: str) -> str:
         """Get status of a session (active/disconnected)."""
@@ -1,10 +1,36 @@
 import json
 import os
 import tempfile
-from datetime import datetime
+import threading
+import time
 from typing import Dict, Optional
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # Optional speedup, see the 'fast' extra
+    orjson = None
+
+
+def _dumps_state(state_data: dict) -> bytes:
+    """Serialize state to indented JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(state_data, option=orjson.OPT_INDENT_2)
+    return json.dumps(state_data, indent=2).encode('utf-8')
+
+
+def _loads_state(raw: bytes) -> dict:
+    """Parse state JSON bytes."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time in ISO 8601 with microseconds and a 'Z' suffix."""
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{nanos // 1000:06d}Z"
+
 
 class StateError(Exception):
     """Raised when state operations fail."""
@@ -14,22 +40,28 @@ class StateError(Exception):
 class SessionState:
     """Represents the state of a single SSH session."""
     
+    __slots__ = ('session_name', 'connection_config', 'tmux_session',
+                 'log_file', 'created_at', '_cached_dict')
+    
     def __init__(self, session_name: str, connection_config: str, 
                  tmux_session: str, log_file: str, created_at: Optional[str] = None):
         self.session_name = session_name
         self.connection_config = connection_config
         self.tmux_session = tmux_session
         self.log_file = log_file
-        self.created_at = created_at or datetime.utcnow().isoformat() + 'Z'
+        self.created_at = created_at or _utc_timestamp()
+        self._cached_dict = None
     
     def to_dict(self) -> dict:
-        """Convert to dictionary for JSON serialization."""
-        return {
-            'connection_config': self.connection_config,
-            'tmux_session': self.tmux_session,
-            'log_file': self.log_file,
-            'created_at': self.created_at
-        }
+        """Convert to dictionary for JSON serialization (built once, shared)."""
+        if self._cached_dict is None:
+            self._cached_dict = {
+                'connection_config': self.connection_config,
+                'tmux_session': self.tmux_session,
+                'log_file': self.log_file,
+                'created_at': self.created_at
+            }
+        return self._cached_dict
     
     @classmethod
     def from_dict(cls, session_name: str, data: dict) -> 'SessionState':
@@ -49,10 +81,14 @@ class StateManager:
     BASE_DIR = os.path.expanduser('~/.mcp-ssh-interactive')
     STATE_PATH = os.path.join(BASE_DIR, 'state.json')
     VERSION = '1.0'
+    FLUSH_DELAY = 0.05  # seconds to coalesce deferred writes
     
     def __init__(self, state_path: Optional[str] = None):
         self.state_path = state_path or self.STATE_PATH
         self.sessions: Dict[str, SessionState] = {}
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
         self._ensure_base_directory()
         self._load_state()
     
@@ -69,9 +105,8 @@ class StateManager:
             return
         
         try:
-            with open(self.state_path, 'r') as f:
-                state_data = json.load(f)
-        except json.JSONDecodeError as e:
+            state_data = _loads_state(Path(self.state_path).read_bytes())
+        except json.JSONDecodeError as e:  # orjson's error subclasses this
             raise StateError(f"Failed to parse state file: {e}")
         except Exception as e:
             raise StateError(f"Failed to read state file: {e}")
@@ -94,18 +129,19 @@ class StateManager:
             # Ensure directory exists
             os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
             
-            # Write to temporary file
+            # Write to temporary file (mkstemp creates it with mode 600)
             fd, temp_path = tempfile.mkstemp(
                 dir=os.path.dirname(self.state_path),
                 prefix='.mcp_ssh_state_',
                 suffix='.tmp'
             )
             
-            with os.fdopen(fd, 'w') as f:
-                json.dump(state_data, f, indent=2)
-            
-            # Set permissions (600)
-            os.chmod(temp_path, 0o600)
+            try:
+                payload = memoryview(_dumps_state(state_data))
+                while payload:
+                    payload = payload[os.write(fd, payload):]
+            finally:
+                os.close(fd)
             
             # Atomic rename
             os.replace(temp_path, self.state_path)
@@ -119,21 +155,48 @@ class StateManager:
                     pass
             raise StateError(f"Failed to save state: {e}")
     
+    def flush(self):
+        """Write pending state changes to disk."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._dirty:
+                self._save_state()
+                self._dirty = False
+    
+    def _mark_dirty(self, flush: bool):
+        """Record a mutation and either save now or schedule a coalesced save."""
+        with self._lock:
+            self._dirty = True
+            if flush:
+                self.flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.FLUSH_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
     def add_session(self, session_name: str, connection_config: str,
-                   tmux_session: str, log_file: str):
-        """Add a new session to state."""
-        if session_name in self.sessions:
-            raise StateError(f"Session '{session_name}' already exists")
+                   tmux_session: str, log_file: str, flush: bool = True):
+        """Add a new session to state.
         
-        session = SessionState(session_name, connection_config, tmux_session, log_file)
-        self.sessions[session_name] = session
-        self._save_state()
-    
-    def remove_session(self, session_name: str):
-        """Remove a session from state."""
-        if session_name in self.sessions:
-            del self.sessions[session_name]
-            self._save_state()
+        Pass flush=False to defer the write; deferred writes are coalesced
+        and saved after FLUSH_DELAY or on the next flush().
+        """
+        with self._lock:
+            if session_name in self.sessions:
+                raise StateError(f"Session '{session_name}' already exists")
+            
+            session = SessionState(session_name, connection_config, tmux_session, log_file)
+            self.sessions[session_name] = session
+            self._mark_dirty(flush)
+    
+    def remove_session(self, session_name: str, flush: bool = True):
+        """Remove a session from state (see add_session for flush)."""
+        with self._lock:
+            if session_name in self.sessions:
+                del self.sessions[session_name]
+                self._mark_dirty(flush)
     
     def get_session(self, session_name: str) -> Optional[SessionState]:
         """Get session by name."""
@@ -150,14 +213,22 @@ class StateManager:
 
 # Logging directory utilities
 
+_log_dir: Optional[str] = None
+
+
 def ensure_log_directory():
-    """Create log directory if it doesn't exist."""
+    """Create log directory if it doesn't exist (checked once per process)."""
+    global _log_dir
+    if _log_dir is not None:
+        return _log_dir
+    
     base_dir = os.path.expanduser('~/.mcp-ssh-interactive')
     log_dir = os.path.join(base_dir, 'logs')
     
     if not os.path.exists(log_dir):
         os.makedirs(log_dir, mode=0o700)
     
+    _log_dir = log_dir
     return log_dir
 
 
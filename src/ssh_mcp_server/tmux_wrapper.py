@@ -1,6 +1,31 @@
+import atexit
+import fcntl
+import os
+import re
+import select
+import shutil
 import subprocess
+import tempfile
+import threading
 import time
-from typing import Optional, Tuple
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+
+# Absolute path to tmux, resolved once. Together with close_fds=False (our own
+# descriptors are non-inheritable anyway) this lets subprocess use posix_spawn
+# instead of fork+exec, which gets expensive as the server's RSS grows.
+TMUX_BIN = shutil.which('tmux') or 'tmux'
+
+# Fixed argument prefixes for the commands issued on every tool call
+_HAS_SESSION_ARGS = ('has-session', '-t')
+_SEND_KEYS_ARGS = ('send-keys', '-t')
+_CAPTURE_PANE_ARGS = ('capture-pane', '-pt')
+_PANE_INFO_ARGS = ('display-message', '-p', '-t')
+_PANE_INFO_FORMAT = '#{history_size}|#{history_limit}|#{pane_height}'
+
+# Cached history lines compared against a fresh capture before reusing it
+_CAPTURE_OVERLAP = 3
 
 
 class TmuxError(Exception):
@@ -8,33 +33,447 @@ class TmuxError(Exception):
     pass
 
 
+class SpecialKey(str):
+    """A tmux key name such as 'Enter', 'Tab' or 'C-c', sent as a key press."""
+    pass
+
+
+class TmuxSessionNotFoundError(TmuxError):
+    """Raised when the target tmux session no longer exists."""
+    pass
+
+
+# stderr fragments tmux uses when a target session (or its server) is gone
+_MISSING_SESSION_MESSAGES = (
+    "can't find session",
+    "can't find pane",
+    "can't find window",
+    'no session found',
+    'no server running',
+    'error connecting to',
+)
+
+
+def _decode_stderr(stderr) -> str:
+    """Return tmux stderr as text; calls that ignore stdout leave it as bytes."""
+    if isinstance(stderr, bytes):
+        return stderr.decode('utf-8', 'replace')
+    return stderr
+
+
+def _is_missing_session(stderr) -> bool:
+    """Check whether a tmux error message means the target session is gone."""
+    stderr = _decode_stderr(stderr).lower()
+    return any(message in stderr for message in _MISSING_SESSION_MESSAGES)
+
+
+class _ClientClosed(Exception):
+    """Raised when a control-mode client exits before answering."""
+    pass
+
+
+class _ControlModeUnsupported(Exception):
+    """Raised when the installed tmux cannot run the control-mode client."""
+    pass
+
+
+# Characters tmux's command parser cannot take inside a quoted argument
+_UNQUOTABLE_RE = re.compile(r'[\x00-\x08\x0b-\x0c\x0e-\x1f]')
+
+# tmux expands '~' to the local home directory even inside double quotes
+_QUOTE_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '"': '\\"',
+    '$': '\\$',
+    '~': '\\~',
+    '\n': '\\n',
+    '\r': '\\r',
+})
+
+
+def _quote_argument(arg: str) -> str:
+    """Quote one argument for a tmux command line.
+    
+    Raises ValueError for arguments that can only be passed via argv.
+    """
+    if _UNQUOTABLE_RE.search(arg):
+        raise ValueError("argument contains control characters")
+    return '"' + arg.translate(_QUOTE_ESCAPES) + '"'
+
+
+# tmux 3.3a's server can crash when a control client attaches or detaches
+# while another attaches or detaches, or while a session is created or
+# killed, even on different sessions.  Those steps take turns: between
+# threads via the RLock, and between processes sharing the tmux server
+# (other MCP servers, parallel test workers) via a file lock
+_CLIENT_LIFECYCLE_LOCK = threading.RLock()
+_CLIENT_LIFECYCLE_LOCK_PATH = os.path.join(
+    tempfile.gettempdir(), f'mcp-ssh-interactive-tmux-{os.getuid()}.lock'
+)
+_client_lifecycle_depth = 0
+
+
+@contextmanager
+def _client_lifecycle():
+    """Hold the client attach/detach and session create/kill lock (reentrant)."""
+    global _client_lifecycle_depth
+    with _CLIENT_LIFECYCLE_LOCK:
+        # flock is per open file, so only the outermost level takes it
+        fd = None
+        if _client_lifecycle_depth == 0:
+            fd = os.open(_CLIENT_LIFECYCLE_LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        _client_lifecycle_depth += 1
+        try:
+            yield
+        finally:
+            _client_lifecycle_depth -= 1
+            if fd is not None:
+                os.close(fd)  # Releases the flock
+
+
+class PersistentTmuxClient:
+    """A tmux control-mode client (``tmux -C``) attached to one session.
+    
+    Commands are written to the client's stdin and answered with a
+    ``%begin``/``%end`` (or ``%error``) block on stdout, so each command
+    costs a pipe round-trip instead of a fork/exec. The client attaches
+    with ``no-output`` (no pane output notifications to drain) and
+    ``ignore-size`` (it never resizes the session's windows).
+    """
+    
+    def __init__(self, session_name: str, timeout: float = 5):
+        self.session_name = session_name
+        # Serializes command round trips and close(); reentrant because
+        # run() closes the client itself on a timeout
+        self._lock = threading.RLock()
+        self._closed = False
+        self._buffer = b''
+        
+        with _client_lifecycle():
+            self._proc = subprocess.Popen(
+                [TMUX_BIN, '-C', 'attach-session', '-f', 'no-output,ignore-size',
+                 '-t', session_name],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0,
+                close_fds=False
+            )
+            
+            try:
+                # The attach itself is answered like any other command
+                ok, output = self._read_reply(time.monotonic() + timeout)
+            except _ClientClosed:
+                # The client has already exited, so its stderr is complete
+                stderr = self._proc.stderr.read().decode('utf-8', 'replace').lower()
+                self.close()
+                if 'usage' in stderr or 'unknown flag' in stderr:
+                    raise _ControlModeUnsupported(stderr.strip())
+                raise
+            except Exception:
+                self.close()
+                raise
+            
+            if not ok:
+                self.close()
+                raise TmuxError(' '.join(output))
+    
+    @property
+    def alive(self) -> bool:
+        """Whether the client process is still running."""
+        return self._proc.poll() is None
+    
+    def run(self, args: Sequence[str], timeout: float) -> subprocess.CompletedProcess:
+        """Run one tmux command and return it as a completed process.
+        
+        Raises ValueError if an argument cannot be sent over the client,
+        _ClientClosed if the client went away, and TimeoutExpired if
+        tmux did not answer in time (the client is closed in that case).
+        """
+        return self.run_chain([args], timeout)[0]
+    
+    def run_chain(self, commands: Sequence[Sequence[str]],
+                  timeout: float) -> List[subprocess.CompletedProcess]:
+        """Run commands as one ';'-chained line and return their results.
+        
+        tmux queues the line's commands together and runs them without
+        reading pane output in between, so the pane can't change between
+        them. It stops at the first
+        failing command, whose result ends the list. Raises like run().
+        """
+        line = ' ; '.join(
+            ' '.join(_quote_argument(arg) for arg in args) for args in commands
+        ) + '\n'
+        payload = memoryview(line.encode('utf-8'))
+        
+        results = []
+        with self._lock:
+            if self._closed:
+                raise _ClientClosed("client closed")
+            try:
+                while payload:
+                    payload = payload[self._proc.stdin.write(payload):]
+            except OSError:
+                raise _ClientClosed("client stdin closed")
+            
+            deadline = time.monotonic() + timeout
+            for args in commands:
+                try:
+                    ok, output = self._read_reply(deadline)
+                except subprocess.TimeoutExpired:
+                    # A late reply would desynchronize the stream
+                    self.close()
+                    raise subprocess.TimeoutExpired([TMUX_BIN, *args], timeout)
+                
+                text = ''.join(output_line + '\n' for output_line in output)
+                if not ok:
+                    results.append(subprocess.CompletedProcess(args, 1, stdout='', stderr=text))
+                    break
+                results.append(subprocess.CompletedProcess(args, 0, stdout=text, stderr=''))
+        
+        return results
+    
+    def close(self):
+        """Detach the client and reap its process.
+        
+        Takes the command lock, so a concurrent run() finishes its round
+        trip before the pipes it reads from are closed, and the lifecycle
+        lock, so the detach doesn't overlap another client's attach.
+        """
+        with self._lock, _client_lifecycle():
+            self._closed = True
+            try:
+                self._proc.stdin.close()
+            except OSError:
+                pass
+            try:
+                self._proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+                self._proc.wait()
+            self._proc.stdout.close()
+            self._proc.stderr.close()
+    
+    def _read_reply(self, deadline: float) -> Tuple[bool, List[str]]:
+        """Read the next command reply, skipping notifications."""
+        guard = None
+        output = []
+        while True:
+            line = self._readline(deadline)
+            if guard is None:
+                if line.startswith('%begin '):
+                    guard = line[len('%begin '):]
+                elif line.startswith('%exit'):
+                    raise _ClientClosed(line)
+                continue
+            
+            kind, _, line_guard = line.partition(' ')
+            if kind in ('%end', '%error') and line_guard == guard:
+                return kind == '%end', output
+            output.append(line)
+    
+    def _readline(self, deadline: float) -> str:
+        """Read one line from the client, waiting until the deadline."""
+        fd = self._proc.stdout.fileno()
+        while b'\n' not in self._buffer:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                    raise subprocess.TimeoutExpired(self._proc.args, remaining)
+                chunk = os.read(fd, 65536)
+            except OSError as e:
+                raise _ClientClosed(f"client read failed: {e}")
+            if not chunk:
+                raise _ClientClosed("client exited")
+            self._buffer += chunk
+        
+        line, _, self._buffer = self._buffer.partition(b'\n')
+        return line.decode('utf-8', 'replace')
+
+
 class TmuxWrapper:
-    """Wrapper for tmux command operations."""
+    """Wrapper for tmux command operations.
+    
+    Commands aimed at one session go through a PersistentTmuxClient for
+    that session when possible and fall back to spawning ``tmux``.
+    
+    When structured data is needed from tmux, ask for it with a ``-F``
+    format string (e.g. ``-F '#{session_name}'``, or several fields joined
+    by ``|``) so tmux emits exactly the fields we want, instead of parsing
+    its human-readable default output.
+    """
+    
+    # Persistent control-mode clients, keyed by session name
+    _clients: Dict[str, PersistentTmuxClient] = {}
+    
+    # Guards inserts and removals; lookups rely on dict.get being atomic
+    _clients_lock = threading.Lock()
+    
+    # Cleared when the installed tmux cannot run control-mode clients
+    _control_mode = True
+    
+    # Last capture per session: (history_size, tail of scrollback lines)
+    _capture_cache: Dict[str, Tuple[int, List[str]]] = {}
+    
+    # Memoized result of check_tmux_installed (None until first checked)
+    _tmux_ok: Optional[bool] = None
     
     @staticmethod
-    def check_tmux_installed() -> bool:
-        """Check if tmux is installed and accessible."""
+    def _get_client(session_name: str, create: bool = True) -> Optional[PersistentTmuxClient]:
+        """Return a live client for the session, attaching one if allowed."""
+        client = TmuxWrapper._clients.get(session_name)
+        if client is not None:
+            if client.alive:
+                return client
+            TmuxWrapper._drop_client(session_name)
+        
+        if not create or not TmuxWrapper._control_mode:
+            return None
+        
+        # Clients of sessions that died elsewhere would otherwise linger
+        TmuxWrapper._prune_clients()
+        
         try:
-            result = subprocess.run(
-                ['tmux', '-V'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            return result.returncode == 0
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            return False
+            client = PersistentTmuxClient(session_name)
+        except _ControlModeUnsupported:
+            TmuxWrapper._control_mode = False
+            return None
+        except (_ClientClosed, TmuxError, OSError, subprocess.TimeoutExpired):
+            return None
+        
+        with TmuxWrapper._clients_lock:
+            # Another thread may have attached while we were connecting
+            existing = TmuxWrapper._clients.get(session_name)
+            if existing is None or not existing.alive:
+                TmuxWrapper._clients[session_name] = client
+                return client
+        
+        client.close()
+        return existing
+    
+    @staticmethod
+    def _drop_client(session_name: str):
+        """Close and forget the session's client, if any."""
+        with TmuxWrapper._clients_lock:
+            client = TmuxWrapper._clients.pop(session_name, None)
+        if client is not None:
+            client.close()
+    
+    @staticmethod
+    def _prune_clients():
+        """Close and forget clients whose process has exited."""
+        with TmuxWrapper._clients_lock:
+            dead = [name for name, client in TmuxWrapper._clients.items() if not client.alive]
+            clients = [TmuxWrapper._clients.pop(name) for name in dead]
+        for client in clients:
+            client.close()
+    
+    @staticmethod
+    def close_clients():
+        """Close all persistent clients (registered to run at exit)."""
+        with TmuxWrapper._clients_lock:
+            clients = list(TmuxWrapper._clients.values())
+            TmuxWrapper._clients.clear()
+        for client in clients:
+            client.close()
+    
+    @staticmethod
+    def _run(session_name: str, args: Sequence[str], timeout: float,
+             create_client: bool = True, text: bool = True,
+             stdout=subprocess.PIPE, stderr=subprocess.PIPE) -> subprocess.CompletedProcess:
+        """Run a tmux command for a session, preferring its persistent client.
+        
+        With ``text=False`` a subprocess fallback returns raw bytes, which
+        suits callers that only look at the return code; ``stdout`` and
+        ``stderr`` may likewise be set to ``subprocess.DEVNULL`` for output
+        the caller never reads.
+        """
+        client = TmuxWrapper._get_client(session_name, create=create_client)
+        if client is not None:
+            try:
+                return client.run(args, timeout)
+            except ValueError:
+                pass  # Not expressible as a command line; use argv
+            except _ClientClosed:
+                TmuxWrapper._drop_client(session_name)
+            except subprocess.TimeoutExpired:
+                TmuxWrapper._drop_client(session_name)
+                raise
+        
+        return subprocess.run(
+            [TMUX_BIN, *args],
+            stdout=stdout,
+            stderr=stderr,
+            close_fds=False,
+            text=text,
+            timeout=timeout
+        )
+    
+    @staticmethod
+    def _run_chain(session_name: str, commands: Sequence[Sequence[str]],
+                   timeout: float) -> Optional[List[subprocess.CompletedProcess]]:
+        """Run commands back to back over the session's existing client.
+        
+        Returns None when there is no usable client; callers then fall
+        back to running the commands separately.
+        """
+        client = TmuxWrapper._get_client(session_name, create=False)
+        if client is None:
+            return None
+        try:
+            return client.run_chain(commands, timeout)
+        except ValueError:
+            return None
+        except _ClientClosed:
+            TmuxWrapper._drop_client(session_name)
+            return None
+        except subprocess.TimeoutExpired:
+            TmuxWrapper._drop_client(session_name)
+            raise
+    
+    @staticmethod
+    def check_tmux_installed() -> bool:
+        """Check if tmux is installed and accessible.
+
+        The result is cached for the lifetime of the process; a missing
+        binary is detected via PATH lookup without spawning anything.
+        """
+        if TmuxWrapper._tmux_ok is None:
+            if shutil.which('tmux') is None:
+                TmuxWrapper._tmux_ok = False
+            else:
+                try:
+                    result = subprocess.run(
+                        [TMUX_BIN, '-V'],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                        close_fds=False,
+                        timeout=5
+                    )
+                    TmuxWrapper._tmux_ok = result.returncode == 0
+                except (subprocess.TimeoutExpired, FileNotFoundError):
+                    TmuxWrapper._tmux_ok = False
+        return TmuxWrapper._tmux_ok
     
     @staticmethod
     def session_exists(session_name: str) -> bool:
         """Check if a tmux session exists."""
         try:
-            result = subprocess.run(
-                ['tmux', 'has-session', '-t', session_name],
-                capture_output=True,
-                timeout=5
+            # Only reuse an existing client; attaching one costs a fork too
+            result = TmuxWrapper._run(
+                session_name,
+                (*_HAS_SESSION_ARGS, session_name),
+                timeout=5,
+                create_client=False,
+                text=False,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
             )
-            return result.returncode == 0
+            if result.returncode != 0:
+                TmuxWrapper._drop_client(session_name)
+                return False
+            return True
         except subprocess.TimeoutExpired:
             raise TmuxError(f"Timeout checking session '{session_name}'")
     
@@ -42,35 +481,85 @@ class TmuxWrapper:
     def create_session(session_name: str) -> bool:
         """Create a new detached tmux session."""
         try:
-            result = subprocess.run(
-                ['tmux', 'new-session', '-d', '-s', session_name],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            with _client_lifecycle():
+                result = subprocess.run(
+                    [TMUX_BIN, 'new-session', '-d', '-s', session_name],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    close_fds=False,
+                    timeout=10
+                )
             
             if result.returncode != 0:
-                raise TmuxError(f"Failed to create session: {result.stderr}")
+                raise TmuxError(f"Failed to create session: {_decode_stderr(result.stderr)}")
             
             return True
             
         except subprocess.TimeoutExpired:
             raise TmuxError(f"Timeout creating session '{session_name}'")
     
+    @staticmethod
+    def batch(commands: List[List[str]], timeout: int = 10):
+        """Run several tmux commands in a single invocation.
+        
+        Commands are chained with tmux's ';' separator and run in order;
+        tmux stops at the first one that fails.
+        """
+        argv = [TMUX_BIN]
+        for index, command in enumerate(commands):
+            if index:
+                argv.append(';')
+            argv.extend(command)
+        
+        try:
+            with _client_lifecycle():
+                result = subprocess.run(
+                    argv,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    close_fds=False,
+                    timeout=timeout
+                )
+            
+            if result.returncode != 0:
+                raise TmuxError(f"Failed to run tmux commands: {_decode_stderr(result.stderr)}")
+                
+        except subprocess.TimeoutExpired:
+            raise TmuxError("Timeout running tmux commands")
+    
+    @staticmethod
+    def create_session_configured(session_name: str, history_limit: int,
+                                  log_file: str, command: Optional[str] = None):
+        """Create a session, set its history limit and start logging in one call.
+        
+        If command is given it is typed (with Enter) after logging starts,
+        so its output is captured in the log from the first byte.
+        """
+        commands = [
+            ['new-session', '-d', '-s', session_name],
+            ['set-option', '-t', session_name, 'history-limit', str(history_limit)],
+            ['pipe-pane', '-t', session_name, '-o', f'cat >> {log_file}'],
+        ]
+        if command is not None:
+            commands.append(['send-keys', '-t', session_name, '--', command, 'Enter'])
+        
+        TmuxWrapper.batch(commands)
+    
     @staticmethod
     def set_history_limit(session_name: str, limit: int = 200000):
         """Set history limit for a tmux session."""
         try:
-            result = subprocess.run(
-                ['tmux', 'set-option', '-t', session_name, 
+            result = TmuxWrapper._run(
+                session_name,
+                ['set-option', '-t', session_name, 
                  'history-limit', str(limit)],
-                capture_output=True,
-                text=True,
-                timeout=5
+                timeout=5,
+                text=False,
+                stdout=subprocess.DEVNULL
             )
             
             if result.returncode != 0:
-                raise TmuxError(f"Failed to set history limit: {result.stderr}")
+                raise TmuxError(f"Failed to set history limit: {_decode_stderr(result.stderr)}")
                 
         except subprocess.TimeoutExpired:
             raise TmuxError(f"Timeout setting history limit for '{session_name}'")
@@ -79,45 +568,125 @@ class TmuxWrapper:
     def send_keys(session_name: str, keys: str, literal: bool = False):
         """Send keys to a tmux session."""
         try:
-            cmd = ['tmux', 'send-keys', '-t', session_name]
-            
             if literal:
-                cmd.append('-l')
+                cmd = (*_SEND_KEYS_ARGS, session_name, '-l', keys)
+            else:
+                cmd = (*_SEND_KEYS_ARGS, session_name, keys)
             
-            cmd.append(keys)
+            result = TmuxWrapper._run(session_name, cmd, timeout=5, text=False,
+                                     stdout=subprocess.DEVNULL)
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=5
+            if result.returncode != 0:
+                if _is_missing_session(result.stderr):
+                    raise TmuxSessionNotFoundError(f"Session '{session_name}' not found")
+                raise TmuxError(f"Failed to send keys: {_decode_stderr(result.stderr)}")
+                
+        except subprocess.TimeoutExpired:
+            raise TmuxError(f"Timeout sending keys to '{session_name}'")
+    
+    @staticmethod
+    def send_literal(session_name: str, text: str):
+        """Type a whole string into a tmux session with one send-keys call."""
+        try:
+            result = TmuxWrapper._run(
+                session_name,
+                (*_SEND_KEYS_ARGS, session_name, '-l', '--', text),
+                timeout=5,
+                text=False,
+                stdout=subprocess.DEVNULL
             )
             
             if result.returncode != 0:
-                raise TmuxError(f"Failed to send keys: {result.stderr}")
+                if _is_missing_session(result.stderr):
+                    raise TmuxSessionNotFoundError(f"Session '{session_name}' not found")
+                raise TmuxError(f"Failed to send keys: {_decode_stderr(result.stderr)}")
                 
         except subprocess.TimeoutExpired:
             raise TmuxError(f"Timeout sending keys to '{session_name}'")
     
+    @staticmethod
+    def send_sequence(session_name: str, items: Sequence[Union[str, SpecialKey]]):
+        """Send a mix of literal text and special keys, in order.
+        
+        Runs of plain strings are joined and typed with a single
+        send_literal call; each SpecialKey is sent as its own key press.
+        """
+        literal: List[str] = []
+        
+        for item in items:
+            if isinstance(item, SpecialKey):
+                if literal:
+                    TmuxWrapper.send_literal(session_name, ''.join(literal))
+                    literal.clear()
+                TmuxWrapper.send_keys(session_name, item)
+            else:
+                literal.append(item)
+        
+        if literal:
+            TmuxWrapper.send_literal(session_name, ''.join(literal))
+    
     @staticmethod
     def send_command(session_name: str, command: str):
         """Send a command (with Enter) to a tmux session."""
-        TmuxWrapper.send_keys(session_name, command)
-        TmuxWrapper.send_keys(session_name, 'Enter')
+        try:
+            # One send-keys call carries both keys; '--' keeps a command
+            # starting with '-' from being parsed as a flag
+            result = TmuxWrapper._run(
+                session_name,
+                (*_SEND_KEYS_ARGS, session_name, '--', command, 'Enter'),
+                timeout=5,
+                text=False,
+                stdout=subprocess.DEVNULL
+            )
+            
+            if result.returncode != 0:
+                if _is_missing_session(result.stderr):
+                    raise TmuxSessionNotFoundError(f"Session '{session_name}' not found")
+                raise TmuxError(f"Failed to send keys: {_decode_stderr(result.stderr)}")
+                
+        except subprocess.TimeoutExpired:
+            raise TmuxError(f"Timeout sending keys to '{session_name}'")
+    
+    @staticmethod
+    def send_commands(session_name: str, commands: Sequence[str]):
+        """Send several commands, each followed by Enter, in one send-keys call."""
+        keys = []
+        for command in commands:
+            keys.extend((command, 'Enter'))
+        
+        try:
+            result = TmuxWrapper._run(
+                session_name,
+                (*_SEND_KEYS_ARGS, session_name, '--', *keys),
+                timeout=5,
+                text=False,
+                stdout=subprocess.DEVNULL
+            )
+            
+            if result.returncode != 0:
+                if _is_missing_session(result.stderr):
+                    raise TmuxSessionNotFoundError(f"Session '{session_name}' not found")
+                raise TmuxError(f"Failed to send keys: {_decode_stderr(result.stderr)}")
+                
+        except subprocess.TimeoutExpired:
+            raise TmuxError(f"Timeout sending keys to '{session_name}'")
     
     @staticmethod
     def send_ctrl_c(session_name: str):
         """Send Ctrl+C to a tmux session."""
         try:
-            result = subprocess.run(
-                ['tmux', 'send-keys', '-t', session_name, 'C-c'],
-                capture_output=True,
-                text=True,
-                timeout=5
+            result = TmuxWrapper._run(
+                session_name,
+                (*_SEND_KEYS_ARGS, session_name, 'C-c'),
+                timeout=5,
+                text=False,
+                stdout=subprocess.DEVNULL
             )
             
             if result.returncode != 0:
-                raise TmuxError(f"Failed to send Ctrl+C: {result.stderr}")
+                if _is_missing_session(result.stderr):
+                    raise TmuxSessionNotFoundError(f"Session '{session_name}' not found")
+                raise TmuxError(f"Failed to send Ctrl+C: {_decode_stderr(result.stderr)}")
                 
         except subprocess.TimeoutExpired:
             raise TmuxError(f"Timeout sending Ctrl+C to '{session_name}'")
@@ -127,35 +696,158 @@ class TmuxWrapper:
         """Start piping tmux pane output to log file."""
         try:
             result = subprocess.run(
-                ['tmux', 'pipe-pane', '-t', session_name, '-o', 
+                [TMUX_BIN, 'pipe-pane', '-t', session_name, '-o', 
                  f'cat >> {log_file}'],
-                capture_output=True,
-                text=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                close_fds=False,
                 timeout=5
             )
             
             if result.returncode != 0:
-                raise TmuxError(f"Failed to start logging: {result.stderr}")
+                raise TmuxError(f"Failed to start logging: {_decode_stderr(result.stderr)}")
                 
         except subprocess.TimeoutExpired:
             raise TmuxError(f"Timeout starting logging for '{session_name}'")
     
+    @staticmethod
+    def _capture_lines(session_name: str, args: Sequence[str],
+                       create_client: bool = True) -> List[str]:
+        """Run a capture-style query and return its output lines."""
+        result = TmuxWrapper._run(session_name, args, timeout=10, create_client=create_client)
+        
+        if result.returncode != 0:
+            if _is_missing_session(result.stderr):
+                raise TmuxSessionNotFoundError(f"Session '{session_name}' not found")
+            raise TmuxError(f"Failed to capture pane: {result.stderr}")
+        
+        # Every line, including the last, ends with a newline
+        return result.stdout.split('\n')[:-1]
+    
+    @staticmethod
+    def _pane_fields(session_name: str, line: str) -> List[int]:
+        """Parse '|'-separated numeric pane fields from display-message.
+        
+        Over a client whose session died elsewhere display-message still
+        succeeds but prints empty fields, so those mean the session is gone.
+        """
+        try:
+            return [int(field) for field in line.split('|')]
+        except ValueError:
+            TmuxWrapper._drop_client(session_name)
+            TmuxWrapper._capture_cache.pop(session_name, None)
+            raise TmuxSessionNotFoundError(f"Session '{session_name}' not found")
+    
     @staticmethod
     def capture_pane(session_name: str, num_lines: int = 200) -> str:
-        """Capture visible pane content."""
+        """Capture visible pane content plus up to num_lines of scrollback.
+        
+        Scrollback lines do not change once written, so after the first
+        capture only the lines added since the previous one are fetched and
+        joined onto the cached history. The cached tail must match what tmux
+        returns for the overlap; if it does not (history was cleared, or the
+        pane scrolled mid-capture) a full capture is taken instead.
+        
+        The extra pane-info query is only worth it over a persistent
+        client; when commands fall back to spawning tmux, a single plain
+        capture is cheaper.
+        """
         try:
-            result = subprocess.run(
-                ['tmux', 'capture-pane', '-pt', session_name, 
-                 '-S', f'-{num_lines}'],
-                capture_output=True,
-                text=True,
-                timeout=10
+            if TmuxWrapper._get_client(session_name) is None:
+                TmuxWrapper._capture_cache.pop(session_name, None)
+                lines = TmuxWrapper._capture_lines(
+                    session_name,
+                    (*_CAPTURE_PANE_ARGS, session_name, '-S', f'-{num_lines}'),
+                    create_client=False
+                )
+                return '\n'.join(lines) + '\n' if lines else ''
+            
+            info = TmuxWrapper._capture_lines(
+                session_name, (*_PANE_INFO_ARGS, session_name, _PANE_INFO_FORMAT)
+            )
+            history_size, history_limit, rows = TmuxWrapper._pane_fields(
+                session_name, info[0] if info else ''
             )
+            wanted = min(num_lines, history_size)
             
-            if result.returncode != 0:
-                raise TmuxError(f"Failed to capture pane: {result.stderr}")
+            cached = TmuxWrapper._capture_cache.get(session_name)
+            # At the limit the oldest lines drop off and history_size stops
+            # growing, so the delta is meaningless there
+            if cached is not None and history_size < history_limit:
+                cached_size, cached_history = cached
+                added = history_size - cached_size
+                overlap = min(_CAPTURE_OVERLAP, len(cached_history))
+                
+                if (overlap and 0 <= added and added + overlap < wanted
+                        and len(cached_history) + added >= wanted):
+                    # Re-read history_size in the same command line: if it is
+                    # unchanged, the pane didn't scroll after the first query
+                    results = TmuxWrapper._run_chain(session_name, [
+                        (*_CAPTURE_PANE_ARGS, session_name, '-S', f'-{added + overlap}'),
+                        (*_PANE_INFO_ARGS, session_name, '#{history_size}'),
+                    ], timeout=10)
+                    unchanged = (results is not None and len(results) == 2
+                                 and results[1].returncode == 0
+                                 and results[1].stdout == f'{history_size}\n')
+                    lines = results[0].stdout.split('\n')[:-1] if unchanged else []
+                    
+                    if (unchanged and len(lines) == overlap + added + rows
+                            and lines[:overlap] == cached_history[-overlap:]):
+                        history = cached_history + lines[overlap:overlap + added]
+                        history = history[len(history) - wanted:]
+                        TmuxWrapper._capture_cache[session_name] = (history_size, history)
+                        return '\n'.join(history + lines[overlap + added:]) + '\n'
+            
+            lines = TmuxWrapper._capture_lines(
+                session_name,
+                (*_CAPTURE_PANE_ARGS, session_name, '-S', f'-{num_lines}')
+            )
+            
+            split = len(lines) - rows
+            if split == wanted:
+                TmuxWrapper._capture_cache[session_name] = (history_size, lines[:split])
+            else:
+                # The pane changed between the two queries; don't trust it
+                TmuxWrapper._capture_cache.pop(session_name, None)
             
-            return result.stdout
+            return '\n'.join(lines) + '\n' if lines else ''
+            
+        except subprocess.TimeoutExpired:
+            raise TmuxError(f"Timeout capturing pane for '{session_name}'")
+    
+    @staticmethod
+    def capture_last_lines(session_name: str, n: int = 1) -> str:
+        """Capture the n lines ending at the cursor line.
+        
+        A plain '-S -n' capture still returns the whole visible pane, most of
+        which is usually blank below the cursor, so over a persistent client
+        the range is anchored on the cursor row instead. Without one, that
+        would take a second fork, so the plain capture is trimmed of
+        trailing blank rows instead.
+        """
+        try:
+            if TmuxWrapper._get_client(session_name) is None:
+                lines = TmuxWrapper._capture_lines(
+                    session_name,
+                    (*_CAPTURE_PANE_ARGS, session_name, '-S', f'-{n}'),
+                    create_client=False
+                )
+                while lines and not lines[-1].strip():
+                    lines.pop()
+                lines = lines[-n:]
+                return '\n'.join(lines) + '\n' if lines else ''
+            
+            info = TmuxWrapper._capture_lines(
+                session_name, (*_PANE_INFO_ARGS, session_name, '#{cursor_y}')
+            )
+            cursor_y, = TmuxWrapper._pane_fields(session_name, info[0] if info else '')
+            
+            lines = TmuxWrapper._capture_lines(
+                session_name,
+                (*_CAPTURE_PANE_ARGS, session_name,
+                 '-S', str(cursor_y - n + 1), '-E', str(cursor_y))
+            )
+            return '\n'.join(lines) + '\n' if lines else ''
             
         except subprocess.TimeoutExpired:
             raise TmuxError(f"Timeout capturing pane for '{session_name}'")
@@ -163,50 +855,65 @@ class TmuxWrapper:
     @staticmethod
     def kill_session(session_name: str):
         """Kill a tmux session."""
+        TmuxWrapper._drop_client(session_name)
+        TmuxWrapper._capture_cache.pop(session_name, None)
         try:
-            result = subprocess.run(
-                ['tmux', 'kill-session', '-t', session_name],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            with _client_lifecycle():
+                result = subprocess.run(
+                    [TMUX_BIN, 'kill-session', '-t', session_name],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    close_fds=False,
+                    timeout=10
+                )
             
             # Don't raise error if session doesn't exist
-            if result.returncode != 0 and 'no session found' not in result.stderr.lower():
-                raise TmuxError(f"Failed to kill session: {result.stderr}")
+            if result.returncode != 0 and not _is_missing_session(result.stderr):
+                raise TmuxError(f"Failed to kill session: {_decode_stderr(result.stderr)}")
                 
         except subprocess.TimeoutExpired:
             raise TmuxError(f"Timeout killing session '{session_name}'")
     
+    @staticmethod
+    def batch_session_exists(session_names: List[str]) -> Dict[str, bool]:
+        """Check several sessions with a single list-sessions call."""
+        if not session_names:
+            return {}
+        alive = TmuxWrapper.list_sessions_set()
+        for name in session_names:
+            if name not in alive:
+                TmuxWrapper._drop_client(name)
+        return {name: name in alive for name in session_names}
+    
     @staticmethod
     def list_sessions() -> list:
         """List all tmux sessions."""
         try:
             result = subprocess.run(
-                ['tmux', 'list-sessions'],
+                [TMUX_BIN, 'list-sessions', '-F', '#{session_name}'],
                 capture_output=True,
+                close_fds=False,
                 text=True,
                 timeout=5
             )
             
             if result.returncode != 0:
-                # No sessions exist
-                if 'no server running' in result.stderr.lower():
+                # No sessions exist (message wording varies by tmux version)
+                stderr = result.stderr.lower()
+                if 'no server running' in stderr or 'error connecting to' in stderr:
                     return []
                 raise TmuxError(f"Failed to list sessions: {result.stderr}")
             
-            # Parse output (format: session_name: window_count windows ...)
-            sessions = []
-            for line in result.stdout.strip().split('\n'):
-                if line:
-                    session_name = line.split(':')[0]
-                    sessions.append(session_name)
-            
-            return sessions
+            # One session name per line
+            return [line for line in result.stdout.splitlines() if line]
             
         except subprocess.TimeoutExpired:
             raise TmuxError("Timeout listing sessions")
+    
+    @staticmethod
+    def list_sessions_set() -> Set[str]:
+        """Snapshot of all tmux session names, for repeated membership checks."""
+        return set(TmuxWrapper.list_sessions())
 
 
-
-
+atexit.register(TmuxWrapper.close_clients)
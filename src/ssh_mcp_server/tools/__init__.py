@@ -1,5 +1,8 @@
 """MCP Tools for SSH operations."""
 
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
 from .list_configs import list_available_configs
 from .connection import (
     open_connection_tool,
@@ -15,7 +18,30 @@ from .terminal import (
 )
 from .server_info import get_server_info_tool
 
+
+def _tool_workers(default: int = 16) -> int:
+    """Read the tool worker count from MCP_SSH_TOOL_WORKERS."""
+    try:
+        return max(1, int(os.environ.get('MCP_SSH_TOOL_WORKERS', default)))
+    except ValueError:
+        return default
+
+
+# Shared pool for tool calls; tools block on tmux and SSH, so they run here
+# rather than on the event loop. Calls beyond the worker count queue up.
+TOOL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=_tool_workers(),
+    thread_name_prefix='mcp-tool'
+)
+
+
+def submit_tool(fn, *args) -> Future:
+    """Run a tool function on the shared tool executor."""
+    return TOOL_EXECUTOR.submit(fn, *args)
+
 __all__ = [
+    "TOOL_EXECUTOR",
+    "submit_tool",
     "list_available_configs",
     "open_connection_tool",
     "close_connection_tool",
@@ -0,0 +1,29 @@
+import functools
+
+from ..ssh_session import SSHSessionError
+from ..tmux_wrapper import TmuxError
+
+
+def mcp_tool_errors(fn):
+    """Turn exceptions escaping a tool into its {'success': False} error result."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except SSHSessionError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        except TmuxError as e:
+            return {
+                'success': False,
+                'error': f'Tmux error: {e}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Unexpected error: {e}'
+            }
+
+    return wrapper
@@ -1,7 +1,9 @@
 from typing import Any
-from ..ssh_session import SSHSessionManager, SSHSessionError
+from ..ssh_session import SSHSessionManager
+from ._errors import mcp_tool_errors
 
 
+@mcp_tool_errors
 def open_connection_tool(session_manager: SSHSessionManager, 
                         connection_config_name: str,
                         session_name: str) -> dict:
@@ -13,22 +15,11 @@ def open_connection_tool(session_manager: SSHSessionManager,
         - connection_config_name: Name from config file
         - session_name: Unique name for this session
     """
-    try:
-        result = session_manager.open_connection(connection_config_name, session_name)
-        return result
-        
-    except SSHSessionError as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'error': f'Unexpected error: {e}'
-        }
+    result = session_manager.open_connection(connection_config_name, session_name)
+    return result
 
 
+@mcp_tool_errors
 def close_connection_tool(session_manager: SSHSessionManager,
                          session_name: str) -> dict:
     """
@@ -38,20 +29,8 @@ def close_connection_tool(session_manager: SSHSessionManager,
     Parameters:
         - session_name: Name of session to close
     """
-    try:
-        result = session_manager.close_connection(session_name)
-        return result
-        
-    except SSHSessionError as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'error': f'Unexpected error: {e}'
-        }
+    result = session_manager.close_connection(session_name)
+    return result
 
 
 def list_connections_tool(session_manager: SSHSessionManager) -> dict:
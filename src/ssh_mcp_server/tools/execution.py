@@ -1,8 +1,10 @@
 from typing import Any
 from ..ssh_session import SSHSessionManager
-from ..tmux_wrapper import TmuxWrapper, TmuxError
+from ..tmux_wrapper import TmuxWrapper, TmuxSessionNotFoundError
+from ._errors import mcp_tool_errors
 
 
+@mcp_tool_errors
 def execute_command_tool(session_manager: SSHSessionManager,
                         session_name: str,
                         command: str) -> dict:
@@ -15,43 +17,31 @@ def execute_command_tool(session_manager: SSHSessionManager,
         - command: Command to execute
     Returns: success status
     """
-    try:
-        # 1. Validate session exists
-        if not session_manager.state.session_exists(session_name):
-            available = [s.session_name for s in session_manager.state.list_sessions()]
-            return {
-                'success': False,
-                'error': f"Session '{session_name}' not found. Available: {available}"
-            }
-        
-        # 2. Check tmux session is alive
-        if not session_manager.tmux.session_exists(session_name):
-            return {
-                'success': False,
-                'error': f"Session '{session_name}' is not active (tmux session not found)"
-            }
-        
-        # 3. Send command
-        session_manager.tmux.send_command(session_name, command)
-        
-        # 4. Return immediately
-        return {
-            'success': True,
-            'session_name': session_name,
-            'command': command,
-            'message': 'Command sent'
-        }
-        
-    except TmuxError as e:
+    # 1. Validate session exists (in-memory; this also keeps commands
+    #    out of tmux sessions that this server did not create)
+    if not session_manager.state.session_exists(session_name):
+        available = [s.session_name for s in session_manager.state.list_sessions()]
         return {
             'success': False,
-            'error': f'Tmux error: {e}'
+            'error': f"Session '{session_name}' not found. Available: {available}"
         }
-    except Exception as e:
+    
+    # 2. Send command (a dead tmux session is reported by send-keys itself)
+    try:
+        session_manager.tmux.send_command(session_name, command)
+    except TmuxSessionNotFoundError:
         return {
             'success': False,
-            'error': f'Unexpected error: {e}'
+            'error': f"Session '{session_name}' is not active (tmux session not found)"
         }
+    
+    # 3. Return immediately
+    return {
+        'success': True,
+        'session_name': session_name,
+        'command': command,
+        'message': 'Command sent'
+    }
 
 
 
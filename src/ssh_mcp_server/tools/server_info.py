@@ -1,7 +1,9 @@
 from typing import Any
 from ..config import ConfigManager, ConfigError
+from ._errors import mcp_tool_errors
 
 
+@mcp_tool_errors
 def get_server_info_tool(config_manager: ConfigManager,
                         connection_config_name: str) -> dict:
     """
@@ -14,49 +16,42 @@ def get_server_info_tool(config_manager: ConfigManager,
         - info_content: Content of the info file (if exists)
         - error: Error message (if any)
     """
+    # Get connection config
+    conn_config = config_manager.get_connection(connection_config_name)
+    if not conn_config:
+        available = list(config_manager.connections.keys())
+        return {
+            'success': False,
+            'error': f"Connection config '{connection_config_name}' not found. Available: {available}"
+        }
+    
+    # Check if info_file is configured
+    if not conn_config.info_file:
+        return {
+            'success': False,
+            'error': f"Connection config '{connection_config_name}' does not have an info_file configured"
+        }
+    
+    # Read info file
     try:
-        # Get connection config
-        conn_config = config_manager.get_connection(connection_config_name)
-        if not conn_config:
-            available = list(config_manager.connections.keys())
-            return {
-                'success': False,
-                'error': f"Connection config '{connection_config_name}' not found. Available: {available}"
-            }
+        with open(conn_config.info_file, 'r', encoding='utf-8') as f:
+            info_content = f.read()
         
-        # Check if info_file is configured
-        if not conn_config.info_file:
-            return {
-                'success': False,
-                'error': f"Connection config '{connection_config_name}' does not have an info_file configured"
-            }
+        return {
+            'success': True,
+            'connection_config_name': connection_config_name,
+            'info_file': conn_config.info_file,
+            'info_content': info_content
+        }
         
-        # Read info file
-        try:
-            with open(conn_config.info_file, 'r', encoding='utf-8') as f:
-                info_content = f.read()
-            
-            return {
-                'success': True,
-                'connection_config_name': connection_config_name,
-                'info_file': conn_config.info_file,
-                'info_content': info_content
-            }
-            
-        except FileNotFoundError:
-            return {
-                'success': False,
-                'error': f"Info file not found: {conn_config.info_file}"
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f"Failed to read info file '{conn_config.info_file}': {str(e)}"
-            }
-            
+    except FileNotFoundError:
+        return {
+            'success': False,
+            'error': f"Info file not found: {conn_config.info_file}"
+        }
     except Exception as e:
         return {
             'success': False,
-            'error': f'Unexpected error: {str(e)}'
+            'error': f"Failed to read info file '{conn_config.info_file}': {str(e)}"
         }
 
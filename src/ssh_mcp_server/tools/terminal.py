@@ -1,8 +1,10 @@
 from typing import Any
 from ..ssh_session import SSHSessionManager
-from ..tmux_wrapper import TmuxWrapper, TmuxError
+from ..tmux_wrapper import TmuxWrapper, TmuxSessionNotFoundError
+from ._errors import mcp_tool_errors
 
 
+@mcp_tool_errors
 def get_terminal_output_tool(session_manager: SSHSessionManager,
                              session_name: str,
                              num_lines: int = 200) -> dict:
@@ -14,46 +16,34 @@ def get_terminal_output_tool(session_manager: SSHSessionManager,
         - session_name: Name of session
         - num_lines: Number of lines to retrieve (default: 200)
     """
-    try:
-        # 1. Validate session exists
-        if not session_manager.state.session_exists(session_name):
-            return {
-                'success': False,
-                'error': f"Session '{session_name}' not found"
-            }
-        
-        # 2. Check tmux session is alive
-        if not session_manager.tmux.session_exists(session_name):
-            return {
-                'success': False,
-                'error': f"Session '{session_name}' is not active"
-            }
-        
-        # 3. Capture pane
-        output = session_manager.tmux.capture_pane(session_name, num_lines)
-        
-        # 4. Count actual lines
-        lines_count = len(output.split('\n'))
-        
-        return {
-            'success': True,
-            'session_name': session_name,
-            'output': output,
-            'lines': lines_count
-        }
-        
-    except TmuxError as e:
+    # 1. Validate session exists
+    if not session_manager.state.session_exists(session_name):
         return {
             'success': False,
-            'error': f'Tmux error: {e}'
+            'error': f"Session '{session_name}' not found"
         }
-    except Exception as e:
+    
+    # 2. Capture pane (a dead tmux session is reported by the capture itself)
+    try:
+        output = session_manager.tmux.capture_pane(session_name, num_lines)
+    except TmuxSessionNotFoundError:
         return {
             'success': False,
-            'error': f'Unexpected error: {e}'
+            'error': f"Session '{session_name}' is not active"
         }
+    
+    # 3. Count actual lines
+    lines_count = output.count('\n') + (1 if output else 0)
+    
+    return {
+        'success': True,
+        'session_name': session_name,
+        'output': output,
+        'lines': lines_count
+    }
 
 
+@mcp_tool_errors
 def interrupt_command_tool(session_manager: SSHSessionManager,
                           session_name: str) -> dict:
     """
@@ -63,40 +53,27 @@ def interrupt_command_tool(session_manager: SSHSessionManager,
     Parameters:
         - session_name: Name of session
     """
-    try:
-        # 1. Validate session exists
-        if not session_manager.state.session_exists(session_name):
-            return {
-                'success': False,
-                'error': f"Session '{session_name}' not found"
-            }
-        
-        # 2. Check tmux session is alive
-        if not session_manager.tmux.session_exists(session_name):
-            return {
-                'success': False,
-                'error': f"Session '{session_name}' is not active"
-            }
-        
-        # 3. Send Ctrl+C
-        session_manager.tmux.send_ctrl_c(session_name)
-        
-        return {
-            'success': True,
-            'session_name': session_name,
-            'message': 'Interrupt signal (Ctrl+C) sent'
-        }
-        
-    except TmuxError as e:
+    # 1. Validate session exists
+    if not session_manager.state.session_exists(session_name):
         return {
             'success': False,
-            'error': f'Tmux error: {e}'
+            'error': f"Session '{session_name}' not found"
         }
-    except Exception as e:
+    
+    # 2. Send Ctrl+C (a dead tmux session is reported by send-keys itself)
+    try:
+        session_manager.tmux.send_ctrl_c(session_name)
+    except TmuxSessionNotFoundError:
         return {
             'success': False,
-            'error': f'Unexpected error: {e}'
+            'error': f"Session '{session_name}' is not active"
         }
+    
+    return {
+        'success': True,
+        'session_name': session_name,
+        'message': 'Interrupt signal (Ctrl+C) sent'
+    }
 
 
 
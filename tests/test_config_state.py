@@ -5,10 +5,12 @@ import sys
 import os
 import tempfile
 
+import pytest
+
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from ssh_mcp_server.config import ConfigManager, ConfigError
+from ssh_mcp_server.config import ConfigManager, ConfigError, ConnectionConfig
 from ssh_mcp_server.state import StateManager, ensure_log_directory, get_log_file_path, ensure_info_directory
 
 
@@ -103,6 +105,37 @@ def test_state_manager():
             print(f"✓ Cleaned up temp file: {temp_state_file}")
 
 
+def test_state_deferred_flush():
+    """Test coalesced state writes."""
+    print("\n=== Testing Deferred State Flush ===")
+    
+    fd, temp_state_file = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    os.unlink(temp_state_file)
+    
+    try:
+        state = StateManager(state_path=temp_state_file)
+        state.FLUSH_DELAY = 60  # Keep the timer out of the way
+        
+        # Deferred mutations are not on disk until flushed
+        state.add_session("deferred_a", "test-server", "deferred_a", "/tmp/a.log", flush=False)
+        state.add_session("deferred_b", "test-server", "deferred_b", "/tmp/b.log", flush=False)
+        assert not StateManager(state_path=temp_state_file).session_exists("deferred_a")
+        print("✓ Deferred sessions not yet persisted")
+        
+        state.flush()
+        reloaded = StateManager(state_path=temp_state_file)
+        assert reloaded.session_exists("deferred_a")
+        assert reloaded.session_exists("deferred_b")
+        print("✓ Sessions persisted after flush()")
+        
+        print("✅ Deferred state flush tests passed!")
+        
+    finally:
+        if os.path.exists(temp_state_file):
+            os.unlink(temp_state_file)
+
+
 def test_config_manager():
     """Test config manager - requires a real config file."""
     print("\n=== Testing Config Manager ===")
@@ -147,6 +180,83 @@ def test_config_manager():
         print("   Check your config file format")
 
 
+def test_config_manager_parsing():
+    """Test config parsing from a temporary file."""
+    print("\n=== Testing Config Parsing ===")
+    
+    base_dir = tempfile.mkdtemp()
+    config_path = os.path.join(base_dir, 'config.yml')
+    key_path = os.path.join(base_dir, 'id_test')
+    
+    try:
+        with open(key_path, 'w') as f:
+            f.write('fake key')
+        
+        # Merge keys from another top-level section are resolved
+        with open(config_path, 'w') as f:
+            f.write(
+                "defaults: &defaults\n"
+                "  user: deploy\n"
+                f"  key_path: {key_path}\n"
+                "connections:\n"
+                "  web:\n"
+                "    <<: *defaults\n"
+                "    host: web.example.com\n"
+                "    port: 2200\n"
+            )
+        config = ConfigManager(config_path)
+        conn = config.get_connection('web')
+        assert conn.user == 'deploy' and conn.port == 2200 and conn.key_path == key_path
+        print("✓ Connection built with merged defaults")
+        
+        # Structural errors are reported as ConfigError
+        for content, message in [
+            ("", "empty"),
+            ("other: 1\n", "'connections' section"),
+            ("connections: [1]\n", "must be a dictionary"),
+        ]:
+            with open(config_path, 'w') as f:
+                f.write(content)
+            try:
+                ConfigManager(config_path)
+                assert False, f"Should have rejected: {content!r}"
+            except ConfigError as e:
+                assert message in str(e)
+        print("✓ Invalid configs rejected")
+        
+        print("✅ Config parsing tests passed!")
+        
+    finally:
+        for path in (config_path, key_path):
+            if os.path.exists(path):
+                os.unlink(path)
+        os.rmdir(base_dir)
+
+
+def test_ssh_command_quoting():
+    """Test that the SSH command quotes key paths with spaces."""
+    print("\n=== Testing SSH Command Quoting ===")
+    
+    with tempfile.TemporaryDirectory() as base_dir:
+        key_path = os.path.join(base_dir, 'my keys', 'id test')
+        os.mkdir(os.path.dirname(key_path))
+        with open(key_path, 'w') as f:
+            f.write('fake key')
+        
+        conn = ConnectionConfig('spaced', {
+            'host': 'web.example.com',
+            'user': 'deploy',
+            'key_path': key_path,
+            'port': 2222,
+        })
+        assert conn.ssh_command == (
+            f"ssh -tt -i '{key_path}' -p 2222 deploy@web.example.com"
+        ), f"Unexpected command: {conn.ssh_command}"
+        print(f"✓ Key path quoted: {conn.ssh_command}")
+    
+    print("✅ SSH command quoting test passed!")
+
+
 def test_info_directory():
     """Test info directory creation."""
     print("\n=== Testing Info Directory ===")
@@ -195,24 +305,4 @@ def test_info_file_resolution():
 
 
 if __name__ == "__main__":
-    print("=" * 60)
-    print("Testing SSH MCP Server - Core Infrastructure")
-    print("=" * 60)
-    
-    try:
-        test_log_directory()
-        test_info_directory()
-        test_info_file_resolution()
-        test_state_manager()
-        test_config_manager()
-        
-        print("\n" + "=" * 60)
-        print("✅ All tests completed!")
-        print("=" * 60)
-        
-    except Exception as e:
-        print(f"\n❌ Test failed with error: {e}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
-
+    sys.exit(pytest.main([__file__]))
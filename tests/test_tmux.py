@@ -3,12 +3,71 @@
 
 import sys
 import os
+import mmap
 import time
+from contextlib import contextmanager
+
+import pytest
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from ssh_mcp_server.tmux_wrapper import TmuxWrapper, TmuxError
+from ssh_mcp_server.tmux_wrapper import TmuxWrapper, TmuxError, SpecialKey
+
+
+# Per process, so parallel workers (pytest -n) each get their own
+SHARED_SESSION = f"ssh_mcp_test_shared_{os.getpid()}"
+
+
+def wait_until(pred, timeout=5.0, interval=0.02):
+    """Poll pred until it returns true or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(interval)
+    return bool(pred())
+
+
+# Login shells can take several seconds to start when many start at once
+PROMPT_TIMEOUT = 30.0
+
+
+def wait_for_prompt(session_name):
+    """Wait for the pane's shell to show a prompt; earlier input may be dropped."""
+    def prompt_shown():
+        lines = TmuxWrapper.capture_pane(session_name, num_lines=0).rstrip().splitlines()
+        return bool(lines) and lines[-1].rstrip().endswith(('$', '#', '%', '>'))
+    return wait_until(prompt_shown, timeout=PROMPT_TIMEOUT)
+
+
+def kill_outside_wrapper(session_name):
+    """Kill a session with plain tmux, leaving the wrapper's client registered."""
+    import subprocess
+    from ssh_mcp_server.tmux_wrapper import _client_lifecycle
+    
+    # Taking turns with client attach/detach keeps tmux 3.3a from crashing
+    with _client_lifecycle():
+        subprocess.run(['tmux', 'kill-session', '-t', session_name], check=True)
+
+
+@contextmanager
+def _shared_session():
+    """Create a fresh tmux session for the tests and kill it afterwards."""
+    TmuxWrapper.kill_session(SHARED_SESSION)
+    TmuxWrapper.create_session(SHARED_SESSION)
+    try:
+        assert wait_for_prompt(SHARED_SESSION), "Shell prompt never appeared"
+        yield SHARED_SESSION
+    finally:
+        TmuxWrapper.kill_session(SHARED_SESSION)
+
+
+@pytest.fixture(scope="module")
+def tmux_session():
+    """One live tmux session shared by the tests that just drive a shell."""
+    with _shared_session() as session_name:
+        yield session_name
 
 
 def test_tmux_installed():
@@ -16,10 +75,7 @@ def test_tmux_installed():
     print("\n=== Testing Tmux Installation ===")
     
     installed = TmuxWrapper.check_tmux_installed()
-    if not installed:
-        print("❌ tmux is not installed!")
-        print("   Please install tmux: sudo apt install tmux")
-        sys.exit(1)
+    assert installed, "tmux is not installed; install it with: sudo apt install tmux"
     
     print("✓ tmux is installed")
     print("✅ Tmux installation test passed!")
@@ -32,74 +88,62 @@ def test_session_operations():
     test_session = "ssh_mcp_test_session"
     
     # Clean up any existing test session
-    try:
-        TmuxWrapper.kill_session(test_session)
-        time.sleep(0.5)
-    except:
-        pass
+    TmuxWrapper.kill_session(test_session)
+    wait_until(lambda: not TmuxWrapper.session_exists(test_session))
     
     # Verify session doesn't exist
-    exists = TmuxWrapper.session_exists(test_session)
-    assert not exists, "Session should not exist initially"
+    sessions = TmuxWrapper.list_sessions_set()
+    assert test_session not in sessions, "Session should not exist initially"
     print("✓ Session doesn't exist initially")
     
     # Create session
     TmuxWrapper.create_session(test_session)
     print(f"✓ Created session: {test_session}")
     
-    # Verify session exists
-    exists = TmuxWrapper.session_exists(test_session)
-    assert exists, "Session should exist after creation"
-    print("✓ Session exists after creation")
+    # Verify session exists and is listed
+    sessions = TmuxWrapper.list_sessions_set()
+    assert test_session in sessions, "Session should exist after creation"
+    print(f"✓ Session appears in list: {sorted(sessions)}")
     
     # Set history limit
     TmuxWrapper.set_history_limit(test_session, 200000)
     print("✓ Set history limit")
     
-    # List sessions
-    sessions = TmuxWrapper.list_sessions()
-    assert test_session in sessions, "Session should be in list"
-    print(f"✓ Session appears in list: {sessions}")
+    # Batched existence check
+    status = TmuxWrapper.batch_session_exists([test_session, "ssh_mcp_test_missing"])
+    assert status == {test_session: True, "ssh_mcp_test_missing": False}, \
+        f"Unexpected batch status: {status}"
+    print("✓ Batched existence check")
     
     # Kill session
     TmuxWrapper.kill_session(test_session)
     print("✓ Killed session")
     
     # Verify session is gone
-    time.sleep(0.5)
-    exists = TmuxWrapper.session_exists(test_session)
-    assert not exists, "Session should not exist after killing"
+    assert wait_until(lambda: not TmuxWrapper.session_exists(test_session)), \
+        "Session should not exist after killing"
     print("✓ Session doesn't exist after killing")
     
     print("✅ Session operations test passed!")
 
 
-def test_send_commands():
+def test_send_commands(tmux_session):
     """Test sending commands to a session."""
     print("\n=== Testing Command Sending ===")
     
-    test_session = "ssh_mcp_test_cmd"
-    
-    # Clean up any existing test session
-    try:
-        TmuxWrapper.kill_session(test_session)
-        time.sleep(0.5)
-    except:
-        pass
-    
-    # Create session
-    TmuxWrapper.create_session(test_session)
-    print(f"✓ Created session: {test_session}")
+    test_session = tmux_session
     
     # Send a simple command
     TmuxWrapper.send_command(test_session, "echo 'Hello from tmux'")
     print("✓ Sent echo command")
     
     # Wait for command to execute
-    time.sleep(0.5)
+    assert wait_until(
+        lambda: "\nHello from tmux" in TmuxWrapper.capture_last_lines(test_session, n=3)
+    ), "Echo output never appeared"
     
-    # Capture pane output
-    output = TmuxWrapper.capture_pane(test_session, num_lines=50)
+    # Capture the last few lines of pane output
+    output = TmuxWrapper.capture_last_lines(test_session, n=3)
     print("✓ Captured pane output")
     print(f"   Output preview: {output[:100]}...")
     
@@ -112,102 +156,374 @@ def test_send_commands():
     TmuxWrapper.send_ctrl_c(test_session)
     print("✓ Sent Ctrl+C")
     
-    # Clean up
+    print("✅ Command sending test passed!")
+
+
+def test_send_sequence():
+    """Test sending literal text mixed with special keys."""
+    print("\n=== Testing Key Sequences ===")
+    
+    test_session = "ssh_mcp_test_sequence"
+    
+    # Clean up any existing test session
+    try:
+        TmuxWrapper.kill_session(test_session)
+    except:
+        pass
+    
+    TmuxWrapper.create_session(test_session)
+    print(f"✓ Created session: {test_session}")
+    
+    assert wait_for_prompt(test_session), "Shell prompt never appeared"
+    
+    # '-' and 'Enter' typed as text must not be read as a flag or key name
+    calls = []
+    send_literal = TmuxWrapper.send_literal
+    TmuxWrapper.send_literal = staticmethod(
+        lambda session, text: (calls.append(text), send_literal(session, text))
+    )
+    try:
+        TmuxWrapper.send_sequence(
+            test_session,
+            ['echo ', '-', 'seq', 'Enter', SpecialKey('Enter')]
+        )
+    finally:
+        TmuxWrapper.send_literal = staticmethod(send_literal)
+    assert calls == ['echo -seqEnter'], f"Literal runs should be coalesced: {calls}"
+    print("✓ Literal runs coalesced into one call")
+    
+    assert wait_until(
+        lambda: '\n-seqEnter' in TmuxWrapper.capture_pane(test_session, num_lines=50)
+    ), "Sequence should run as typed"
+    print("✓ Special key sent after the text")
+    
+    TmuxWrapper.kill_session(test_session)
+    print("✅ Key sequence test passed!")
+
+
+def test_batch_commands():
+    """Test running chained tmux commands in one invocation."""
+    print("\n=== Testing Batched Commands ===")
+    
+    test_session = "ssh_mcp_test_batch"
+    
+    # Clean up any existing test session
+    TmuxWrapper.kill_session(test_session)
+    wait_until(lambda: not TmuxWrapper.session_exists(test_session))
+    
+    TmuxWrapper.batch([
+        ['new-session', '-d', '-s', test_session],
+        ['set-option', '-t', test_session, 'history-limit', '5000'],
+    ])
+    assert TmuxWrapper.session_exists(test_session), "Batch should create the session"
+    print(f"✓ Created and configured session in one call: {test_session}")
+    
+    # A failing command surfaces as TmuxError
+    try:
+        TmuxWrapper.batch([['new-session', '-d', '-s', test_session]])
+        assert False, "Duplicate session should fail"
+    except TmuxError as e:
+        assert 'duplicate session' in str(e)
+        print("✓ Failure reported as TmuxError")
+    
     TmuxWrapper.kill_session(test_session)
     print("✓ Cleaned up session")
     
-    print("✅ Command sending test passed!")
+    print("✅ Batched commands test passed!")
 
 
-def test_logging():
-    """Test logging to a file."""
-    print("\n=== Testing Logging ===")
+def test_persistent_client():
+    """Test that session commands reuse a control-mode client."""
+    print("\n=== Testing Persistent Client ===")
     
-    test_session = "ssh_mcp_test_log"
-    log_file = "/tmp/ssh_mcp_test.log"
+    test_session = "ssh_mcp_test_client"
     
-    # Clean up
+    # Clean up any existing test session
+    TmuxWrapper.kill_session(test_session)
+    wait_until(lambda: not TmuxWrapper.session_exists(test_session))
+    
+    TmuxWrapper.create_session(test_session)
+    print(f"✓ Created session: {test_session}")
+    assert wait_for_prompt(test_session), "Shell prompt never appeared"
+    
+    # Quotes, dollars and a trailing ';' must survive the command line
+    TmuxWrapper.send_keys(test_session, 'echo "it\'s" $HOME;', literal=True)
+    client = TmuxWrapper._clients.get(test_session)
+    assert client is not None and client.alive, "Client should be attached"
+    print("✓ Client attached")
+    
+    # Wait for the shell to echo the keys
+    assert wait_until(
+        lambda: 'echo "it\'s" $HOME;' in TmuxWrapper.capture_pane(test_session, num_lines=50)
+    ), "Keys should arrive unmodified"
+    assert TmuxWrapper._clients.get(test_session) is client, "Client should be reused"
+    print("✓ Client reused and arguments preserved")
+    
+    # tmux would expand a leading '~' to the local home directory
+    for word in (' ', '~/x', ' ', '~nosuchuser'):
+        TmuxWrapper.send_keys(test_session, word, literal=True)
+    assert wait_until(
+        lambda: '$HOME; ~/x ~nosuchuser' in TmuxWrapper.capture_pane(test_session, num_lines=50)
+    ), "'~' should be sent literally"
+    print("✓ Tilde arguments sent literally")
+    
+    # Chained commands answer in order and stop at the first failure
+    results = client.run_chain([('display-message', '-p', 'one'),
+                                ('display-message', '-p', 'two')], timeout=5)
+    assert [r.stdout for r in results] == ['one\n', 'two\n'], f"Unexpected: {results}"
+    results = client.run_chain([('capture-pane', '-p', '-t', 'ssh_mcp_test_no_such'),
+                                ('display-message', '-p', 'two')], timeout=5)
+    assert len(results) == 1 and results[0].returncode != 0, f"Unexpected: {results}"
+    assert client.run(('display-message', '-p', 'three'), timeout=5).stdout == 'three\n', \
+        "Client should stay in sync after a failed chain"
+    print("✓ Chained commands answered in order")
+    
+    TmuxWrapper.kill_session(test_session)
+    assert test_session not in TmuxWrapper._clients, "Client should be reaped"
+    assert not client.alive
+    print("✓ Client reaped with the session")
+    
+    print("✅ Persistent client test passed!")
+
+
+def test_client_closed_during_commands():
+    """Test that closing clients never breaks commands or the tmux server."""
+    print("\n=== Testing Client Close During Commands ===")
+    
+    import threading
+    
+    # Clients of different sessions attach and detach concurrently too
+    test_sessions = ["ssh_mcp_test_client_close_a", "ssh_mcp_test_client_close_b"]
+    for test_session in test_sessions:
+        TmuxWrapper.kill_session(test_session)
+        TmuxWrapper.create_session(test_session)
+    
+    errors = []
+    stop = threading.Event()
+    def capture_loop(test_session):
+        while not stop.is_set():
+            try:
+                TmuxWrapper.capture_pane(test_session, num_lines=10)
+            except Exception as e:  # Anything here is a bug
+                errors.append(e)
+    
+    readers = [threading.Thread(target=capture_loop, args=(name,)) for name in test_sessions]
+    for reader in readers:
+        reader.start()
+    try:
+        # Each drop closes a client another thread may be reading from
+        for _ in range(100):
+            for test_session in test_sessions:
+                TmuxWrapper._drop_client(test_session)
+            time.sleep(0.002)
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+    
+    try:
+        assert not errors, f"Captures failed while clients closed: {errors[:3]}"
+        assert TmuxWrapper.list_sessions_set().issuperset(test_sessions), \
+            "tmux server should survive client churn"
+        print("✓ Captures survived concurrent client closes")
+    finally:
+        for test_session in test_sessions:
+            TmuxWrapper.kill_session(test_session)
+    
+    print("✅ Client close test passed!")
+
+
+def test_capture_dead_session():
+    """Test that captures of a session killed elsewhere report it missing."""
+    print("\n=== Testing Capture Of Dead Session ===")
+    
+    from ssh_mcp_server.tmux_wrapper import TmuxSessionNotFoundError
+    
+    test_session = "ssh_mcp_test_dead_capture"
+    
+    # Keeps the tmux server up; with no sessions left it exits and takes
+    # the client with it straight away
+    keeper = "ssh_mcp_test_dead_capture_keeper"
+    TmuxWrapper.kill_session(keeper)
+    TmuxWrapper.create_session(keeper)
+    try:
+        for capture in (TmuxWrapper.capture_pane, TmuxWrapper.capture_last_lines):
+            # Whether the client notices the death first is a race; repeat
+            for _ in range(20):
+                TmuxWrapper.kill_session(test_session)
+                TmuxWrapper.create_session(test_session)
+                capture(test_session)  # Attaches a client
+                
+                # Killed outside the wrapper, so the client is still registered
+                kill_outside_wrapper(test_session)
+                with pytest.raises(TmuxSessionNotFoundError):
+                    capture(test_session)
+            print(f"✓ {capture.__name__} reports the dead session")
+    finally:
+        TmuxWrapper.kill_session(keeper)
+    
+    print("✅ Dead session capture test passed!")
+
+
+def test_differential_capture():
+    """Test that incremental captures match a full capture."""
+    print("\n=== Testing Differential Capture ===")
+    
+    import subprocess
+    
+    test_session = "ssh_mcp_test_capture"
+    
+    # Clean up any existing test session
     try:
         TmuxWrapper.kill_session(test_session)
-        time.sleep(0.5)
     except:
         pass
     
-    if os.path.exists(log_file):
-        os.unlink(log_file)
-    
-    # Create session
     TmuxWrapper.create_session(test_session)
     print(f"✓ Created session: {test_session}")
     
+    def full_capture():
+        return subprocess.run(
+            ['tmux', 'capture-pane', '-pt', test_session, '-S', '-50'],
+            capture_output=True, text=True
+        ).stdout
+    
+    def settled(marker):
+        # True once the marker shows and the prompt redraw has settled
+        previous = [None]
+        def check():
+            output = full_capture()
+            stable = marker in output and output == previous[0]
+            previous[0] = output
+            return stable
+        return check
+    
+    assert wait_for_prompt(test_session), "Shell prompt never appeared"
+    
+    # Scroll output into history, then grow it and clear it between captures
+    for step, command in enumerate(['seq 1 80', 'seq 100 110', 'clear; seq 200 230']):
+        marker = f"done-{step}"
+        TmuxWrapper.send_command(test_session, f"{command}; echo {marker}")
+        wait_until(settled(f"\n{marker}"), interval=0.1)
+
+        # Compare only against a pane that didn't change around the capture
+        captures = []
+        def stable_capture():
+            before = full_capture()
+            captures[:] = [TmuxWrapper.capture_pane(test_session, 50), full_capture()]
+            return before == captures[1]
+        wait_until(stable_capture, interval=0.1)
+        assert captures[0] == captures[1], \
+            f"Capture after '{command}' differs from a full capture"
+        print(f"✓ Capture matches after: {command}")
+    
+    TmuxWrapper.kill_session(test_session)
+    assert test_session not in TmuxWrapper._capture_cache, "Cache should be dropped"
+    print("✓ Capture cache dropped with the session")
+    
+    print("✅ Differential capture test passed!")
+
+
+def test_capture_without_client(monkeypatch):
+    """Test that captures take a single plain tmux call without a client."""
+    print("\n=== Testing Capture Without Client ===")
+    
+    import subprocess
+    
+    test_session = "ssh_mcp_test_plain_capture"
+    TmuxWrapper.kill_session(test_session)
+    TmuxWrapper.create_session(test_session)
+    
+    # As with a tmux that cannot run control-mode clients
+    monkeypatch.setattr(TmuxWrapper, '_control_mode', False)
+    try:
+        assert wait_for_prompt(test_session), "Shell prompt never appeared"
+        TmuxWrapper.send_command(test_session, "seq 1 5")
+        assert wait_until(lambda: "\n5\n" in TmuxWrapper.capture_last_lines(test_session, n=3))
+        assert wait_for_prompt(test_session), "Shell prompt never appeared"
+        assert test_session not in TmuxWrapper._clients, "No client should attach"
+        
+        calls = []
+        real_run = subprocess.run
+        def counting_run(*args, **kwargs):
+            calls.append(args[0])
+            return real_run(*args, **kwargs)
+        monkeypatch.setattr(subprocess, 'run', counting_run)
+        
+        output = TmuxWrapper.capture_pane(test_session, 50)
+        last = TmuxWrapper.capture_last_lines(test_session, n=3)
+        assert len(calls) == 2, f"Expected one tmux call per capture: {calls}"
+        monkeypatch.undo()
+        
+        full = subprocess.run(
+            ['tmux', 'capture-pane', '-pt', test_session, '-S', '-50'],
+            capture_output=True, text=True
+        ).stdout
+        assert output == full, "Plain capture should match tmux's output"
+        assert last == '\n'.join(full.rstrip().split('\n')[-3:]) + '\n', \
+            f"Unexpected last lines: {last!r}"
+        assert test_session not in TmuxWrapper._capture_cache, "Nothing should be cached"
+        print("✓ One tmux call per capture without a client")
+    finally:
+        monkeypatch.undo()
+        TmuxWrapper.kill_session(test_session)
+    
+    print("✅ Capture without client test passed!")
+
+
+def test_logging(tmux_session):
+    """Test logging to a file."""
+    print("\n=== Testing Logging ===")
+    
+    test_session = tmux_session
+    log_file = "/tmp/ssh_mcp_test.log"
+    
+    # Clean up
+    if os.path.exists(log_file):
+        os.unlink(log_file)
+    
     # Start logging
     TmuxWrapper.start_logging(test_session, log_file)
     print(f"✓ Started logging to: {log_file}")
     
     # Send commands with markers
-    TmuxWrapper.send_command(test_session, "echo '__BEGIN__test123__'")
-    TmuxWrapper.send_command(test_session, "echo 'Test output'")
-    TmuxWrapper.send_command(test_session, "echo '__END__test123__'")
+    TmuxWrapper.send_commands(test_session, [
+        "echo '__BEGIN__test123__'",
+        "echo 'Test output'",
+        "echo '__END__test123__'",
+    ])
     print("✓ Sent commands with markers")
     
-    # Wait for output to be logged
-    time.sleep(1)
+    # Wait for the END marker's output line to be logged
+    def end_logged():
+        if not os.path.exists(log_file):
+            return False
+        with open(log_file, 'rb') as f:
+            # The typed command has a closing quote before its line break
+            return b"__END__test123__\r\n" in f.read()
+    # An empty log can't be mapped, so fail here with the real reason
+    assert wait_until(end_logged), "Log never received END marker"
     
     # Check log file exists
     assert os.path.exists(log_file), "Log file should exist"
     print("✓ Log file created")
     
-    # Read log file
-    with open(log_file, 'r') as f:
-        log_content = f.read()
-    
-    print(f"✓ Log file size: {len(log_content)} bytes")
-    
-    # Verify markers are in log
-    assert "__BEGIN__test123__" in log_content, "Should find BEGIN marker"
-    assert "__END__test123__" in log_content, "Should find END marker"
-    assert "Test output" in log_content, "Should find test output"
+    # Map the log file rather than reading and decoding it
+    with open(log_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as log_content:
+        print(f"✓ Log file size: {len(log_content)} bytes")
+        
+        # Verify markers are in log
+        assert log_content.find(b"__BEGIN__test123__") != -1, "Should find BEGIN marker"
+        assert log_content.find(b"__END__test123__") != -1, "Should find END marker"
+        assert log_content.find(b"Test output") != -1, "Should find test output"
     print("✓ Found all markers and output in log file")
     
     # Clean up
-    TmuxWrapper.kill_session(test_session)
     os.unlink(log_file)
-    print("✓ Cleaned up session and log file")
+    print("✓ Cleaned up log file")
     
     print("✅ Logging test passed!")
 
 
 if __name__ == "__main__":
-    print("=" * 60)
-    print("Testing SSH MCP Server - Tmux Integration")
-    print("=" * 60)
-    
-    try:
-        test_tmux_installed()
-        test_session_operations()
-        test_send_commands()
-        test_logging()
-        
-        print("\n" + "=" * 60)
-        print("✅ All tmux tests passed!")
-        print("=" * 60)
-        
-    except AssertionError as e:
-        print(f"\n❌ Test assertion failed: {e}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
-    except TmuxError as e:
-        print(f"\n❌ Tmux error: {e}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
-    except Exception as e:
-        print(f"\n❌ Test failed with error: {e}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
-
-
-
-
+    sys.exit(pytest.main([__file__]))